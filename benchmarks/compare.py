@@ -0,0 +1,77 @@
+"""
+Сравнение двух прогонов бенчмарка.
+
+    python -m benchmarks.compare benchmarks/results/baseline.json benchmarks/results/new.json --threshold 20
+
+Выводит изменения задержек и пропускной способности и завершается с кодом 1, если p95 вырос
+или пропускная способность упала больше чем на threshold процентов.
+"""
+import argparse
+import json
+import sys
+
+LATENCY_METRICS = ["p50", "p95", "p99"]
+
+
+def change_percent(old, new):
+    if not old:
+        return None
+    return (new - old) / old * 100
+
+
+def compare(baseline, current, threshold):
+    """
+    Возвращает список (строка отчёта, регрессия ли это).
+    """
+    rows = []
+    for store, modes in current["stores"].items():
+        base_modes = baseline["stores"].get(store, {})
+        if "skipped" in modes or "skipped" in base_modes:
+            continue
+        for mode, result in modes.items():
+            base = base_modes.get(mode)
+            if not base or not base.get("latency_ms") or not result.get("latency_ms"):
+                continue
+
+            for metric in LATENCY_METRICS:
+                old, new = base["latency_ms"][metric], result["latency_ms"][metric]
+                delta = change_percent(old, new)
+                regression = metric == "p95" and delta is not None and delta > threshold
+                rows.append((f"{store}/{mode} {metric}: {old} → {new} мс ({delta:+.1f}%)" if delta is not None
+                             else f"{store}/{mode} {metric}: {old} → {new} мс", regression))
+
+            for concurrency, value in result.get("throughput", {}).items():
+                old_value = base.get("throughput", {}).get(concurrency)
+                if not old_value:
+                    continue
+                old, new = old_value["checks_per_second"], value["checks_per_second"]
+                delta = change_percent(old, new)
+                regression = delta is not None and -delta > threshold
+                rows.append((f"{store}/{mode} x{concurrency}: {old} → {new} проверок/с"
+                             + (f" ({delta:+.1f}%)" if delta is not None else ""), regression))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сравнение двух прогонов бенчмарка")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=20.0, help="допустимое ухудшение, %%")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.current) as file:
+        current = json.load(file)
+
+    rows = compare(baseline, current, args.threshold)
+    for line, regression in rows:
+        print(("❌ " if regression else "   ") + line)
+
+    regressions = sum(regression for _, regression in rows)
+    print(f"Регрессий: {regressions}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,336 @@
+"""
+Офлайн-бенчмарк модулей сторов на синтетических ответах.
+
+Замеряются накладные расходы кода бота (HTTP-клиент, условные запросы, разбор, пул Chrome) на
+ответах фиксированного размера; это не проверка парсеров на настоящей разметке сторов и не оценка
+задержки настоящих сторов. Сохранённые настоящие ответы можно подставить через --fixtures DIR.
+
+Запуск из корня проекта:
+    python -m benchmarks.run
+    python -m benchmarks.run --stores appstore googleplay --iterations 500 --concurrency 1 8 32
+    python -m benchmarks.run --output benchmarks/results/baseline.json
+
+Сеть не нужна: запросы модулей сторов перенаправляются на локальный FixtureServer.
+AppGallery читается через Selenium и измеряется, только если установлены selenium и Chrome.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from benchmarks.server import FIXTURES_DIR, FixtureServer
+
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def setup_appstore(base_url):
+    import stores.appstore as appstore
+    appstore.LOOKUP_URL = f"{base_url}/lookup"
+    return appstore.get_version_appstore, "https://apps.apple.com/ru/app/example/id1234567890"
+
+
+def setup_rustore(base_url):
+    import stores.rustore as rustore
+    rustore.API_URL = f"{base_url}/applicationData/overallInfo/{{package_name}}"
+    return rustore.get_version_rustore_api, "https://www.rustore.ru/catalog/app/com.example.app"
+
+
+def setup_googleplay(base_url):
+    from stores.googleplay import get_version_googleplay_http
+    return get_version_googleplay_http, f"{base_url}/store/apps/details?id=com.example.app"
+
+
+def setup_appgallery(base_url):
+    from stores.appgallery import get_version_appgallery
+    return get_version_appgallery, f"{base_url}/app/C123456789"
+
+
+# Стор -> (подготовка: base_url -> (функция загрузки, url), нужен ли браузер)
+STORE_SETUPS = {
+    "appstore": (setup_appstore, False),
+    "rustore": (setup_rustore, False),
+    "googleplay": (setup_googleplay, False),
+    "appgallery": (setup_appgallery, True),
+}
+
+
+class ResourceSampler:
+    """
+    Фоновый замер пикового RSS (процесс и все его потомки) и числа процессов Chrome.
+    На системах без /proc доступен только пиковый RSS самого процесса.
+    """
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_rss_bytes = 0
+        self.peak_chrome_processes = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+        self._sample()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        if not os.path.isdir("/proc"):
+            # ru_maxrss — в КБ на Linux и в байтах на macOS
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            self.peak_rss_bytes = max(self.peak_rss_bytes, maxrss if sys.platform == "darwin" else maxrss * 1024)
+            return
+
+        rss = 0
+        chrome = 0
+        for pid, name in process_tree(os.getpid()):
+            rss += read_rss(pid)
+            if pid != os.getpid() and "chrom" in name.lower():
+                chrome += 1
+        self.peak_rss_bytes = max(self.peak_rss_bytes, rss)
+        self.peak_chrome_processes = max(self.peak_chrome_processes, chrome)
+
+
+def process_tree(root_pid):
+    """
+    Процесс root_pid и все его потомки: список (pid, имя) по данным /proc.
+    """
+    children = {}
+    names = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as file:
+                stat = file.read()
+        except OSError:
+            continue
+        # Формат: pid (имя) состояние ppid ...; имя может содержать пробелы и скобки
+        name = stat[stat.index("(") + 1:stat.rindex(")")]
+        ppid = int(stat[stat.rindex(")") + 2:].split()[1])
+        names[int(entry)] = name
+        children.setdefault(ppid, []).append(int(entry))
+
+    tree = []
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        tree.append((pid, names.get(pid, "")))
+        stack.extend(children.get(pid, []))
+    return tree
+
+
+def read_rss(pid):
+    try:
+        with open(f"/proc/{pid}/status") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def percentiles(samples):
+    """
+    p50/p95/p99, среднее и максимум в миллисекундах.
+    """
+    if not samples:
+        return None
+    ms = [sample * 1000 for sample in samples]
+    if len(ms) == 1:
+        cuts = ms * 99
+    else:
+        cuts = statistics.quantiles(ms, n=100, method="inclusive")
+    return {
+        "p50": round(cuts[49], 3),
+        "p95": round(cuts[94], 3),
+        "p99": round(cuts[98], 3),
+        "mean": round(statistics.fmean(ms), 3),
+        "max": round(max(ms), 3),
+    }
+
+
+def timed_check(fetch, url, before_check=None):
+    if before_check:
+        before_check()
+    started = time.perf_counter()
+    fetch(url)
+    return time.perf_counter() - started
+
+
+def measure_latency(fetch, url, iterations, before_check=None):
+    """
+    Последовательные проверки: задержка каждой и число ошибок.
+    """
+    samples = []
+    errors = 0
+    for _ in range(iterations):
+        try:
+            samples.append(timed_check(fetch, url, before_check))
+        except Exception:
+            errors += 1
+    return {"latency_ms": percentiles(samples), "errors": errors}
+
+
+def measure_throughput(fetch, url, iterations, concurrency, before_check=None):
+    """
+    iterations проверок на пуле из concurrency потоков: проверок в секунду и задержки под нагрузкой.
+    """
+    samples = []
+    errors = 0
+    lock = threading.Lock()
+
+    def worker():
+        nonlocal errors
+        try:
+            duration = timed_check(fetch, url, before_check)
+        except Exception:
+            with lock:
+                errors += 1
+            return
+        with lock:
+            samples.append(duration)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(iterations):
+            executor.submit(worker)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "checks_per_second": round(len(samples) / elapsed, 2) if elapsed else None,
+        "latency_ms": percentiles(samples),
+        "errors": errors,
+    }
+
+
+def run_mode(fetch, url, iterations, concurrency_levels, warmup, before_check=None):
+    for _ in range(warmup):
+        try:
+            fetch(url)
+        except Exception:
+            pass
+
+    with ResourceSampler() as sampler:
+        result = measure_latency(fetch, url, iterations, before_check)
+        result["throughput"] = {
+            str(concurrency): measure_throughput(fetch, url, iterations, concurrency, before_check)
+            for concurrency in concurrency_levels
+        }
+    result["peak_rss_mb"] = round(sampler.peak_rss_bytes / 1024 / 1024, 1)
+    result["peak_chrome_processes"] = sampler.peak_chrome_processes
+    return result
+
+
+def benchmark_store(store, args):
+    """
+    Замеры одного стора. Для HTTP-сторов два режима:
+    cold — каждый раз полная загрузка и разбор (кеш условных запросов сбрасывается),
+    warm — сервер отдаёт ETag, повторные проверки получают 304 без разбора.
+    """
+    from stores.conditional import conditional_cache
+
+    setup, needs_browser = STORE_SETUPS[store]
+    iterations = args.browser_iterations if needs_browser else args.iterations
+    modes = {"cold": (False, conditional_cache.clear)}
+    if not needs_browser:
+        modes["warm"] = (True, None)
+
+    results = {}
+    for mode, (etag, before_check) in modes.items():
+        conditional_cache.clear()
+        with FixtureServer(fixtures_dir=args.fixtures, etag=etag, latency=args.latency) as server:
+            try:
+                fetch, url = setup(server.base_url)
+            except Exception as e:
+                return {"skipped": f"{type(e).__name__}: {e}"}
+
+            result = run_mode(fetch, url, iterations, args.concurrency, args.warmup, before_check)
+            result["server"] = {
+                "requests": server.requests,
+                "not_modified": server.not_modified,
+                "bytes_sent": server.bytes_sent,
+            }
+        results[mode] = result
+        print_mode_summary(store, mode, result)
+    return results
+
+
+def print_mode_summary(store, mode, result):
+    latency = result["latency_ms"] or {}
+    throughput = ", ".join(
+        f"x{concurrency}: {value['checks_per_second']}/с" for concurrency, value in result["throughput"].items()
+    )
+    print(
+        f"{store:<11} {mode:<5} p50={latency.get('p50')} мс p95={latency.get('p95')} мс p99={latency.get('p99')} мс | "
+        f"{throughput} | RSS {result['peak_rss_mb']} МБ, Chrome: {result['peak_chrome_processes']}, "
+        f"ошибок: {result['errors']}"
+    )
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Офлайн-бенчмарк модулей сторов на синтетических ответах")
+    parser.add_argument("--stores", nargs="+", choices=list(STORE_SETUPS), default=list(STORE_SETUPS))
+    parser.add_argument("--iterations", type=int, default=200, help="проверок на замер для HTTP-сторов")
+    parser.add_argument("--browser-iterations", type=int, default=10, help="проверок на замер для Selenium-сторов")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="уровни параллельности")
+    parser.add_argument("--warmup", type=int, default=3, help="прогревочных проверок перед замером")
+    parser.add_argument("--latency", type=float, default=0.0, help="искусственная задержка ответа сервера, с")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="каталог с ответами сторов (по умолчанию синтетические)")
+    parser.add_argument("--output", help="файл результатов (по умолчанию benchmarks/results/<время>.json)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    started_at = datetime.now()
+
+    results = {store: benchmark_store(store, args) for store in args.stores}
+
+    report = {
+        "meta": {
+            "started_at": started_at.isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "stores": results,
+    }
+
+    output = args.output or os.path.join(DEFAULT_RESULTS_DIR, f"{started_at:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2, ensure_ascii=False)
+    print(f"Результаты сохранены в {output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import hashlib
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Синтетические ответы сторов: те же форматы и пути к данным, что ожидают парсеры, но не снятые
+# с настоящих страниц (размер разметки добит повторяющимися стилями и блоками «похожих приложений»)
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "synthetic")
+
+# Префикс пути -> (файл фикстуры, Content-Type). Пути повторяют настоящие API и страницы сторов
+ROUTES = [
+    ("/lookup", "appstore_lookup.json", "text/javascript; charset=utf-8"),
+    ("/applicationData/overallInfo/", "rustore_overall_info.json", "application/json"),
+    ("/store/apps/details", "googleplay_details.html", "text/html; charset=utf-8"),
+    ("/app/", "appgallery_app.html", "text/html; charset=utf-8"),
+]
+
+
+class FixtureServer:
+    """
+    Локальный HTTP-сервер, отдающий ответы сторов из fixtures_dir (по умолчанию синтетические из benchmarks/synthetic).
+    etag=True включает ETag и ответы 304 на If-None-Match; latency — искусственная задержка ответа в секундах.
+
+    Пример:
+        with FixtureServer() as server:
+            print(server.base_url)
+    """
+
+    def __init__(self, fixtures_dir=FIXTURES_DIR, etag=False, latency=0.0):
+        self.etag = etag
+        self.latency = latency
+        self.requests = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+
+        self._fixtures = {}
+        for prefix, filename, content_type in ROUTES:
+            with open(os.path.join(fixtures_dir, filename), "rb") as file:
+                body = file.read()
+            self._fixtures[prefix] = (body, content_type, f'"{hashlib.sha1(body).hexdigest()}"')
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fixture-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _record(self, sent, not_modified=False):
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += sent
+            self.not_modified += not_modified
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, как у настоящих сторов
+            disable_nagle_algorithm = True  # Иначе заголовки и тело ответа ждут отложенного ACK (~40 мс)
+
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+
+                fixture = next(
+                    (value for prefix, value in server._fixtures.items() if self.path.startswith(prefix)), None
+                )
+                if fixture is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    server._record(0)
+                    return
+
+                body, content_type, etag = fixture
+                if server.etag and self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    server._record(0, not_modified=True)
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                if server.etag:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+                server._record(len(body))
+
+            def log_message(self, format, *args):
+                pass  # Не засоряем вывод бенчмарка
+
+        return Handler
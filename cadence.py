@@ -0,0 +1,117 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+import db
+from settings import get_setting
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Время в next_due и расписании пользователей — UTC+3
+MSK = timezone(timedelta(hours=3))
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# После выхода версии часто следуют исправления: сутки опрашиваем с интервалом пользователя
+RECENT_RELEASE_WINDOW = DAY
+
+# Пока приложение наблюдается меньше недели и обновлений почти нет, о его ритме ничего не известно
+MIN_OBSERVATION = 7 * DAY
+
+# Как долго профиль приложения считается актуальным, секунд
+PROFILE_TTL = 15 * 60
+
+
+class ReleaseProfile:
+    """
+    Ритм обновлений приложения по истории версий (таблица snapshots).
+    «Горячие» часы — час выхода каждой версии ±1 час в тот же день недели, а также часы суток,
+    в которые версии выходили хотя бы дважды.
+    """
+
+    def __init__(self, first_seen, change_times):
+        self.first_seen = first_seen
+        self.releases = len(change_times)
+        self.last_change = change_times[-1] if change_times else None
+
+        self.weekly_hours = set()  # (день недели, час)
+        hour_counts = {}
+        for fetched_at in change_times:
+            moment = datetime.fromtimestamp(fetched_at, MSK)
+            for shift in (-1, 0, 1):
+                shifted = moment + timedelta(hours=shift)
+                self.weekly_hours.add((shifted.weekday(), shifted.hour))
+                hour_counts[shifted.hour] = hour_counts.get(shifted.hour, 0) + 1
+        self.daily_hours = {hour for hour, count in hour_counts.items() if count >= 2}
+
+    def is_hot(self, moment):
+        return (moment.weekday(), moment.hour) in self.weekly_hours or moment.hour in self.daily_hours
+
+    def is_known(self, now):
+        """
+        Достаточно ли истории, чтобы отходить от интервала пользователя.
+        """
+        return self.first_seen is not None and (self.releases >= 2 or now - self.first_seen >= MIN_OBSERVATION)
+
+
+_profiles = {}  # (store, app_key) -> (время расчёта, ReleaseProfile)
+_profiles_lock = threading.Lock()
+
+
+def get_release_profile(store, app_key):
+    """
+    Профиль обновлений приложения (пересчитывается не чаще раза в PROFILE_TTL секунд).
+    """
+    key = (store, app_key)
+    now = time.time()
+    with _profiles_lock:
+        cached = _profiles.get(key)
+    if cached and now - cached[0] < PROFILE_TTL:
+        return cached[1]
+
+    since = now - get_setting("adaptive_history_days", 90) * DAY
+    profile = ReleaseProfile(*db.get_change_times(store, app_key, since))
+    with _profiles_lock:
+        _profiles[key] = (now, profile)
+    return profile
+
+
+def adaptive_interval(profile, base_minutes, max_minutes, now=None):
+    """
+    Интервал до следующей проверки приложения в минутах, от base_minutes до max_minutes.
+    Интервал пользователя используется в «горячие» часы, сутки после выхода версии и пока
+    ритм приложения неизвестен; в остальное время опрос реже, но не позже начала следующего
+    «горячего» часа.
+    """
+    now = now or time.time()
+    max_minutes = max(max_minutes, base_minutes)
+
+    if not profile.is_known(now):
+        return base_minutes
+    if profile.last_change is not None and now - profile.last_change < RECENT_RELEASE_WINDOW:
+        return base_minutes
+
+    moment = datetime.fromtimestamp(now, MSK)
+    if profile.is_hot(moment):
+        return base_minutes
+
+    # Ищем ближайший «горячий» час в пределах потолка
+    next_hour = moment.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    horizon = moment + timedelta(minutes=max_minutes)
+    while next_hour < horizon:
+        if profile.is_hot(next_hour):
+            return max(base_minutes, (next_hour - moment).total_seconds() / 60)
+        next_hour += timedelta(hours=1)
+    return max_minutes
+
+
+def adaptive_next_due(subscription, user, now=None):
+    """
+    Время следующей проверки подписки (UTC+3, формат next_due) в адаптивном режиме.
+    Потолок интервала — users.max_interval или adaptive_max_interval из config.json.
+    """
+    now = now or time.time()
+    max_minutes = (user.max_interval if user and user.max_interval else None) or get_setting("adaptive_max_interval", 240)
+    profile = get_release_profile(subscription.store, subscription.app_key)
+    minutes = adaptive_interval(profile, subscription.interval, max_minutes, now)
+    return (datetime.fromtimestamp(now, MSK) + timedelta(minutes=minutes)).strftime(TIME_FORMAT)
@@ -0,0 +1,764 @@
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from metrics import timed_query
+
+DB_PATH = "store_snap.db"
+
+# Колонки users со ссылками на приложения до перехода на таблицу subscriptions (миграция 2)
+LEGACY_STORE_COLUMNS = {
+    "appstore": "appstore_url",
+    "rustore": "rustore_url",
+    "googleplay": "googleplay_url",
+    "appgallery": "appgallery_url",
+}
+
+# max_interval — потолок интервала адаптивного опроса в минутах (NULL — значение из config.json)
+User = namedtuple("User", ["user_id", "full_name", "interval", "last_monitoring", "max_interval"])
+
+# Подписка пользователя на приложение в сторе.
+# next_due — время следующей проверки (UTC+3, NULL — мониторинг остановлен),
+# notified_version — версия, о которой пользователь уже получил уведомление.
+Subscription = namedtuple(
+    "Subscription",
+    ["id", "user_id", "store", "app_key", "url", "interval", "next_due", "notified_version"]
+)
+
+# Исходящее сообщение Telegram, ожидающее отправки (telegram_utils.SendQueue)
+OutboxMessage = namedtuple("OutboxMessage", ["id", "chat_id", "text", "parse_mode", "attempts"])
+
+# Задание на проверку подписки в общей очереди воркеров (worker.py).
+# attempts — сколько раз задание уже выдавалось воркерам (включая текущую аренду)
+Job = namedtuple("Job", ["id", "attempts", "subscription"])
+
+USER_COLUMNS = ", ".join(User._fields)
+SUBSCRIPTION_COLUMNS = ", ".join(Subscription._fields)
+OUTBOX_COLUMNS = ", ".join(OutboxMessage._fields)
+
+_local = threading.local()
+
+
+def get_connection():
+    """
+    Соединение с SQLite для текущего потока. Открывается один раз и переиспользуется,
+    поэтому кеш подготовленных выражений sqlite3 работает между запросами.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH, timeout=5, isolation_level=None, cached_statements=256)
+        conn.execute("PRAGMA journal_mode=WAL")  # Читатели не блокируют писателя
+        conn.execute("PRAGMA synchronous=NORMAL")  # В режиме WAL безопасно и заметно быстрее FULL
+        conn.execute("PRAGMA busy_timeout=5000")  # Ждём блокировку вместо «database is locked»
+        _local.conn = conn
+        _local.depth = 0
+    return conn
+
+
+def close_connection():
+    """
+    Закрывает соединение текущего потока.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+
+@contextmanager
+def transaction(immediate=False):
+    """
+    Транзакция на соединении текущего потока. Вложенные вызовы входят во внешнюю транзакцию.
+    immediate=True сразу берёт блокировку записи (для «прочитать и записать» без гонок).
+    """
+    conn = get_connection()
+    depth = _local.depth
+    if depth == 0:
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    _local.depth = depth + 1
+    try:
+        yield conn
+    except BaseException:
+        _local.depth = depth
+        if depth == 0:
+            conn.rollback()
+        raise
+    _local.depth = depth
+    if depth == 0:
+        conn.commit()
+
+
+# --- Миграции ---
+
+def _migration_1_initial(conn):
+    """
+    Исходная схема: users с колонками ссылок, история версий, кеш сторов.
+    """
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY,
+        full_name TEXT,
+        appstore_url TEXT,
+        rustore_url TEXT,
+        googleplay_url TEXT,
+        appgallery_url TEXT,
+        interval INTEGER DEFAULT 10,
+        last_monitoring TEXT,
+        next_monitoring TEXT
+    )
+    """)
+    # История версий приложений: строка добавляется только при изменении версии или changelog
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS snapshots (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        app_key TEXT NOT NULL,
+        store TEXT NOT NULL,
+        version TEXT,
+        last_updated TEXT,
+        changelog_hash TEXT,
+        fetched_at REAL NOT NULL
+    )
+    """)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_snapshots_app_store_fetched ON snapshots (app_key, store, fetched_at)"
+    )
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS user_versions (
+        user_id INTEGER NOT NULL,
+        store TEXT NOT NULL,
+        app_key TEXT NOT NULL,
+        version TEXT,
+        PRIMARY KEY (user_id, store)
+    )
+    """)
+    # Сохранённый кеш данных сторов (stores/cache.py)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS snapshot_cache (
+        store TEXT NOT NULL,
+        app_key TEXT NOT NULL,
+        version TEXT,
+        changelog TEXT,
+        last_updated TEXT,
+        fetched_at REAL NOT NULL,
+        PRIMARY KEY (store, app_key)
+    )
+    """)
+
+
+def _migration_2_subscriptions(conn):
+    """
+    Таблица subscriptions вместо колонок users.*_url (несколько приложений в одном сторе).
+    Ссылки, next_monitoring и user_versions переносятся в подписки, данные пользователей сохраняются.
+    """
+    from stores.keys import get_app_key
+
+    conn.execute("""
+    CREATE TABLE subscriptions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        store TEXT NOT NULL,
+        app_key TEXT NOT NULL,
+        url TEXT NOT NULL,
+        interval INTEGER NOT NULL DEFAULT 10,
+        next_due TEXT,
+        notified_version TEXT,
+        UNIQUE (user_id, store, app_key)
+    )
+    """)
+    # Планировщик выбирает работу запросом WHERE next_due <= ? ORDER BY next_due LIMIT n
+    conn.execute("CREATE INDEX idx_subscriptions_next_due ON subscriptions (next_due)")
+    conn.execute("CREATE INDEX idx_subscriptions_user ON subscriptions (user_id)")
+
+    notified = {
+        (user_id, store, app_key): version
+        for user_id, store, app_key, version in conn.execute("SELECT user_id, store, app_key, version FROM user_versions")
+    }
+    rows = conn.execute(
+        f"SELECT user_id, {', '.join(LEGACY_STORE_COLUMNS.values())}, interval, next_monitoring FROM users"
+    ).fetchall()
+    for user_id, *urls, interval, next_monitoring in rows:
+        for store, url in zip(LEGACY_STORE_COLUMNS, urls):
+            if not url or not url.strip():
+                continue
+            try:
+                app_key = get_app_key(store, url)
+            except ValueError:
+                app_key = url.strip()  # Нераспознанная ссылка — сохраняем как есть
+            conn.execute(
+                """
+                INSERT OR IGNORE INTO subscriptions (user_id, store, app_key, url, interval, next_due, notified_version)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (user_id, store, app_key, url.strip(), interval or 10, next_monitoring,
+                 notified.get((user_id, store, app_key)))
+            )
+
+    # Пересоздаём users без колонок ссылок (DROP COLUMN есть не во всех версиях SQLite)
+    conn.execute("""
+    CREATE TABLE users_new (
+        user_id INTEGER PRIMARY KEY,
+        full_name TEXT,
+        interval INTEGER DEFAULT 10,
+        last_monitoring TEXT
+    )
+    """)
+    conn.execute(
+        "INSERT INTO users_new (user_id, full_name, interval, last_monitoring) "
+        "SELECT user_id, full_name, interval, last_monitoring FROM users"
+    )
+    conn.execute("DROP TABLE users")
+    conn.execute("ALTER TABLE users_new RENAME TO users")
+    conn.execute("DROP TABLE user_versions")
+
+
+def _migration_3_outbox(conn):
+    """
+    Очередь исходящих сообщений Telegram (outbox), переживающая перезапуск.
+    """
+    conn.execute("""
+    CREATE TABLE outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chat_id INTEGER NOT NULL,
+        text TEXT NOT NULL,
+        parse_mode TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt REAL NOT NULL,
+        created_at REAL NOT NULL
+    )
+    """)
+    conn.execute("CREATE INDEX idx_outbox_next_attempt ON outbox (next_attempt)")
+
+
+def _migration_4_subscriptions_app_index(conn):
+    """
+    Индекс подписок по приложению для рассылки одного изменения всем подписчикам.
+    """
+    conn.execute("CREATE INDEX idx_subscriptions_app ON subscriptions (store, app_key)")
+
+
+def _migration_5_users_max_interval(conn):
+    """
+    Потолок интервала адаптивного опроса для пользователя (users.max_interval).
+    """
+    conn.execute("ALTER TABLE users ADD COLUMN max_interval INTEGER")
+
+
+def _migration_6_jobs(conn):
+    """
+    Очередь заданий мониторинга (jobs) для воркеров на нескольких машинах.
+    """
+    conn.execute("""
+    CREATE TABLE jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        subscription_id INTEGER NOT NULL UNIQUE,
+        available_at REAL NOT NULL,
+        worker TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        created_at REAL NOT NULL
+    )
+    """)
+    conn.execute("CREATE INDEX idx_jobs_available_at ON jobs (available_at)")
+
+
+# Миграции применяются по порядку; номер последней применённой хранится в PRAGMA user_version
+MIGRATIONS = [
+    _migration_1_initial,
+    _migration_2_subscriptions,
+    _migration_3_outbox,
+    _migration_4_subscriptions_app_index,
+    _migration_5_users_max_interval,
+    _migration_6_jobs,
+]
+
+
+def get_schema_version():
+    return get_connection().execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate():
+    """
+    Применяет недостающие миграции, каждую в своей транзакции. Возвращает текущую версию схемы.
+    Безопасно при одновременном запуске нескольких процессов (бот и воркеры).
+    """
+    applied = get_schema_version()
+    while applied < len(MIGRATIONS):
+        with transaction(immediate=True) as conn:
+            # Версию перечитываем под блокировкой записи: пока мы её ждали, другой процесс мог применить миграцию
+            applied = get_schema_version()
+            if applied >= len(MIGRATIONS):
+                break
+            migration = MIGRATIONS[applied]
+            migration(conn)
+            applied += 1
+            conn.execute(f"PRAGMA user_version = {applied}")
+        print(f"Применена миграция {applied}: {migration.__doc__.strip().splitlines()[0]}")
+    return len(MIGRATIONS)
+
+
+# --- Пользователи ---
+
+def user_exists(user_id):
+    return get_connection().execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,)).fetchone() is not None
+
+
+def create_user(user_id, full_name=None, interval=10):
+    """
+    Регистрирует пользователя (если его ещё нет). Возвращает True, если пользователь создан.
+    """
+    with transaction() as conn:
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO users (user_id, full_name, interval) VALUES (?, ?, ?)",
+            (user_id, full_name, interval)
+        )
+        return cursor.rowcount > 0
+
+
+def update_full_name(user_id, full_name):
+    with transaction() as conn:
+        conn.execute("UPDATE users SET full_name = ? WHERE user_id = ?", (full_name, user_id))
+
+
+def delete_user(user_id):
+    with transaction() as conn:
+        conn.execute("DELETE FROM subscriptions WHERE user_id = ?", (user_id,))
+        conn.execute("DELETE FROM outbox WHERE chat_id = ?", (user_id,))
+        conn.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
+
+
+def get_user(user_id):
+    """
+    Возвращает User или None.
+    """
+    row = get_connection().execute(f"SELECT {USER_COLUMNS} FROM users WHERE user_id = ?", (user_id,)).fetchone()
+    return User(*row) if row else None
+
+
+def set_interval(user_id, interval):
+    """
+    Меняет интервал пользователя и всех его подписок.
+    """
+    with transaction() as conn:
+        conn.execute("UPDATE users SET interval = ? WHERE user_id = ?", (interval, user_id))
+        conn.execute("UPDATE subscriptions SET interval = ? WHERE user_id = ?", (interval, user_id))
+
+
+def set_max_interval(user_id, max_interval):
+    with transaction() as conn:
+        conn.execute("INSERT OR IGNORE INTO users (user_id) VALUES (?)", (user_id,))
+        conn.execute("UPDATE users SET max_interval = ? WHERE user_id = ?", (max_interval, user_id))
+
+
+def set_last_monitoring(user_id, last_monitoring):
+    with transaction() as conn:
+        conn.execute("UPDATE users SET last_monitoring = ? WHERE user_id = ?", (last_monitoring, user_id))
+
+
+# --- Подписки ---
+
+@timed_query
+def get_subscriptions(user_id):
+    """
+    Подписки пользователя, упорядоченные по стору и времени добавления.
+    """
+    rows = get_connection().execute(
+        f"""
+        SELECT {SUBSCRIPTION_COLUMNS} FROM subscriptions WHERE user_id = ?
+        ORDER BY CASE store WHEN 'appstore' THEN 0 WHEN 'rustore' THEN 1 WHEN 'googleplay' THEN 2 ELSE 3 END, id
+        """,
+        (user_id,)
+    )
+    return [Subscription(*row) for row in rows]
+
+
+@timed_query
+def add_subscription(user_id, store, app_key, url, replace_store=False, next_due=None):
+    """
+    Добавляет подписку (пользователь создаётся при необходимости).
+    replace_store=True удаляет прежние подписки пользователя на этот стор.
+    Если у пользователя запущен мониторинг, новая подписка сразу ставится в очередь (next_due).
+    """
+    with transaction() as conn:
+        conn.execute("INSERT OR IGNORE INTO users (user_id) VALUES (?)", (user_id,))
+        active = is_monitoring(user_id)
+        if replace_store:
+            conn.execute("DELETE FROM subscriptions WHERE user_id = ? AND store = ?", (user_id, store))
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO subscriptions (user_id, store, app_key, url, interval, next_due)
+            VALUES (?, ?, ?, ?, (SELECT interval FROM users WHERE user_id = ?), ?)
+            """,
+            (user_id, store, app_key, url, user_id, next_due if active else None)
+        )
+
+
+def remove_subscriptions(user_id, store):
+    with transaction() as conn:
+        conn.execute("DELETE FROM subscriptions WHERE user_id = ? AND store = ?", (user_id, store))
+
+
+@timed_query
+def fan_out_notification(store, app_key, version, text, parse_mode="HTML"):
+    """
+    Находит одним запросом (по индексу idx_subscriptions_app) все активные подписки на приложение,
+    ещё не уведомлённые о версии, ставит им одно и то же сообщение в очередь отправки
+    и отмечает версию уведомлённой. Всё выполняется в одной транзакции, поэтому
+    уведомление не теряется и не дублируется. Возвращает список user_id получателей.
+    """
+    with transaction(immediate=True) as conn:
+        rows = conn.execute(
+            """
+            SELECT id, user_id FROM subscriptions
+            WHERE store = ? AND app_key = ? AND next_due IS NOT NULL AND notified_version IS NOT ?
+            """,
+            (store, app_key, version)
+        ).fetchall()
+        if not rows:
+            return []
+        conn.executemany(
+            "UPDATE subscriptions SET notified_version = ? WHERE id = ?",
+            [(version, subscription_id) for subscription_id, _ in rows]
+        )
+        # У пользователя может быть несколько подписок на одно приложение — одно сообщение на чат
+        user_ids = sorted({user_id for _, user_id in rows})
+        enqueue_messages([(user_id, text) for user_id in user_ids], parse_mode)
+    return user_ids
+
+
+# --- Расписание мониторинга ---
+
+def is_monitoring(user_id):
+    """
+    Мониторинг пользователя запущен, если хотя бы одна его подписка стоит в очереди.
+    """
+    return get_connection().execute(
+        "SELECT 1 FROM subscriptions WHERE user_id = ? AND next_due IS NOT NULL LIMIT 1", (user_id,)
+    ).fetchone() is not None
+
+
+def start_monitoring(user_id, next_due):
+    """
+    Ставит все подписки пользователя в очередь. Уведомлённые версии сбрасываются,
+    чтобы пользователь снова получил актуальные версии своих приложений.
+    """
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE subscriptions SET next_due = ?, notified_version = NULL WHERE user_id = ?",
+            (next_due, user_id)
+        )
+
+
+def stop_monitoring(user_id):
+    with transaction() as conn:
+        conn.execute("UPDATE subscriptions SET next_due = NULL WHERE user_id = ?", (user_id,))
+
+
+@timed_query
+def claim_due_subscriptions(now, limit=100):
+    """
+    Выбирает до limit подписок с next_due <= now (по индексу idx_subscriptions_next_due)
+    и сразу переносит их next_due на now + interval, чтобы следующий запрос их не вернул.
+    """
+    with transaction(immediate=True) as conn:
+        rows = conn.execute(
+            f"""
+            SELECT {SUBSCRIPTION_COLUMNS} FROM subscriptions
+            WHERE next_due <= ? ORDER BY next_due LIMIT ?
+            """,
+            (now, limit)
+        ).fetchall()
+        conn.executemany(
+            "UPDATE subscriptions SET next_due = datetime(?, '+' || interval || ' minutes') WHERE id = ?",
+            [(now, row[0]) for row in rows]
+        )
+    return [Subscription(*row) for row in rows]
+
+
+@timed_query
+def get_next_due():
+    """
+    Ближайшее время проверки среди всех подписок или None.
+    """
+    return get_connection().execute("SELECT MIN(next_due) FROM subscriptions").fetchone()[0]
+
+
+@timed_query
+def get_overdue_seconds():
+    """
+    На сколько секунд просрочена самая старая ожидающая проверка (0, если просроченных нет).
+    """
+    overdue = get_connection().execute(
+        "SELECT (julianday(datetime('now', '+3 hours')) - julianday(MIN(next_due))) * 86400 FROM subscriptions"
+    ).fetchone()[0]
+    return max(overdue or 0, 0)
+
+
+@timed_query
+def delay_subscription(subscription_id, next_due):
+    """
+    Переносит проверку подписки (например, после ошибки), не трогая остановленные.
+    """
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE subscriptions SET next_due = ? WHERE id = ? AND next_due IS NOT NULL",
+            (next_due, subscription_id)
+        )
+
+
+# --- История версий ---
+
+@timed_query
+def get_latest_snapshot(store, app_key):
+    """
+    Последняя строка истории (version, last_updated, changelog_hash, fetched_at) или None.
+    """
+    return get_connection().execute(
+        """
+        SELECT version, last_updated, changelog_hash, fetched_at FROM snapshots
+        WHERE app_key = ? AND store = ?
+        ORDER BY fetched_at DESC LIMIT 1
+        """,
+        (app_key, store)
+    ).fetchone()
+
+
+@timed_query
+def insert_snapshot(store, app_key, version, last_updated, changelog_hash, fetched_at):
+    with transaction() as conn:
+        conn.execute(
+            """
+            INSERT INTO snapshots (app_key, store, version, last_updated, changelog_hash, fetched_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (app_key, store, version, last_updated, changelog_hash, fetched_at)
+        )
+
+
+def get_version_history(store, app_key, days=30):
+    """
+    Версии приложения за последние days дней: список (version, last_updated, fetched_at), новые первыми.
+    """
+    return get_connection().execute(
+        """
+        SELECT version, last_updated, fetched_at FROM snapshots
+        WHERE app_key = ? AND store = ? AND fetched_at >= ?
+        ORDER BY fetched_at DESC
+        """,
+        (app_key, store, time.time() - days * 86400)
+    ).fetchall()
+
+
+@timed_query
+def get_change_times(store, app_key, since):
+    """
+    Моменты обнаружения новых версий приложения начиная с since (time.time()), по возрастанию.
+    Самая первая строка истории — начало отслеживания, а не выход версии, поэтому она не учитывается.
+    Возвращает (время первой строки истории или None, список моментов).
+    """
+    conn = get_connection()
+    first_seen = conn.execute(
+        "SELECT MIN(fetched_at) FROM snapshots WHERE app_key = ? AND store = ?", (app_key, store)
+    ).fetchone()[0]
+    if first_seen is None:
+        return None, []
+    rows = conn.execute(
+        """
+        SELECT fetched_at FROM snapshots
+        WHERE app_key = ? AND store = ? AND fetched_at > ? AND fetched_at >= ?
+        ORDER BY fetched_at
+        """,
+        (app_key, store, first_seen, since)
+    )
+    return first_seen, [fetched_at for fetched_at, in rows]
+
+
+# --- Сохранённый кеш сторов ---
+
+def load_cached_snapshots():
+    """
+    Все записи сохранённого кеша: список (store, app_key, version, changelog, last_updated, fetched_at).
+    """
+    return get_connection().execute(
+        "SELECT store, app_key, version, changelog, last_updated, fetched_at FROM snapshot_cache ORDER BY fetched_at"
+    ).fetchall()
+
+
+@timed_query
+def save_cached_snapshot(store, app_key, version, changelog, last_updated, fetched_at):
+    with transaction() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO snapshot_cache (store, app_key, version, changelog, last_updated, fetched_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (store, app_key, version, changelog, last_updated, fetched_at)
+        )
+
+
+@timed_query
+def delete_expired_cached_snapshots(ttls, default_ttl, now):
+    """
+    Удаляет записи сохранённого кеша старше TTL своего стора (ttls — {стор: секунды},
+    для остальных сторов — default_ttl). Возвращает число удалённых записей.
+    """
+    with transaction() as conn:
+        deleted = 0
+        for store, ttl in ttls.items():
+            deleted += conn.execute(
+                "DELETE FROM snapshot_cache WHERE store = ? AND fetched_at < ?", (store, now - ttl)
+            ).rowcount
+        placeholders = ", ".join("?" for _ in ttls)
+        deleted += conn.execute(
+            f"DELETE FROM snapshot_cache WHERE store NOT IN ({placeholders}) AND fetched_at < ?",
+            (*ttls, now - default_ttl)
+        ).rowcount
+        return deleted
+
+
+# --- Очередь исходящих сообщений ---
+
+@timed_query
+def enqueue_messages(messages, parse_mode="HTML"):
+    """
+    Добавляет сообщения в очередь отправки одной транзакцией. messages — список (chat_id, text).
+    """
+    now = time.time()
+    with transaction() as conn:
+        conn.executemany(
+            "INSERT INTO outbox (chat_id, text, parse_mode, next_attempt, created_at) VALUES (?, ?, ?, ?, ?)",
+            [(chat_id, text, parse_mode, now, now) for chat_id, text in messages]
+        )
+
+
+@timed_query
+def claim_outbox_messages(now, limit=50, lease=60):
+    """
+    Выбирает до limit сообщений, время отправки которых наступило, в порядке очереди и
+    откладывает их на lease секунд: если процесс упадёт во время отправки, сообщения вернутся в очередь.
+    """
+    with transaction(immediate=True) as conn:
+        rows = conn.execute(
+            f"SELECT {OUTBOX_COLUMNS} FROM outbox WHERE next_attempt <= ? ORDER BY next_attempt, id LIMIT ?",
+            (now, limit)
+        ).fetchall()
+        conn.executemany(
+            "UPDATE outbox SET next_attempt = ? WHERE id = ?",
+            [(now + lease, row[0]) for row in rows]
+        )
+    return [OutboxMessage(*row) for row in rows]
+
+
+@timed_query
+def reschedule_outbox_message(message, next_attempt, attempts):
+    """
+    Откладывает сообщение до next_attempt. Более поздние сообщения того же чата откладываются
+    не меньше чем до того же времени, чтобы чат получал сообщения в исходном порядке.
+    """
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE outbox SET next_attempt = ?, attempts = ? WHERE id = ?",
+            (next_attempt, attempts, message.id)
+        )
+        conn.execute(
+            "UPDATE outbox SET next_attempt = MAX(next_attempt, ?) WHERE chat_id = ? AND id > ?",
+            (next_attempt, message.chat_id, message.id)
+        )
+
+
+@timed_query
+def delete_outbox_message(message_id):
+    with transaction() as conn:
+        conn.execute("DELETE FROM outbox WHERE id = ?", (message_id,))
+
+
+@timed_query
+def get_next_outbox_attempt():
+    """
+    Ближайшее время отправки (time.time()) среди сообщений очереди или None.
+    """
+    return get_connection().execute("SELECT MIN(next_attempt) FROM outbox").fetchone()[0]
+
+
+@timed_query
+def count_outbox_messages():
+    return get_connection().execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+
+# --- Очередь заданий мониторинга ---
+
+@timed_query
+def enqueue_jobs(subscription_ids):
+    """
+    Ставит проверки подписок в очередь воркеров. Подписка, уже стоящая в очереди, второй раз не добавляется.
+    """
+    now = time.time()
+    with transaction() as conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO jobs (subscription_id, available_at, created_at) VALUES (?, ?, ?)",
+            [(subscription_id, now, now) for subscription_id in subscription_ids]
+        )
+
+
+@timed_query
+def claim_jobs(worker, now, limit=10, lease=300):
+    """
+    Выдаёт воркеру до limit заданий в аренду на lease секунд. Задание, аренда которого истекла
+    (воркер упал или завис), снова доступно и достаётся следующему воркеру.
+    Задания удалённых и остановленных подписок удаляются из очереди.
+    """
+    columns = ", ".join(f"s.{column}" for column in Subscription._fields)
+    with transaction(immediate=True) as conn:
+        rows = conn.execute(
+            f"""
+            SELECT j.id, j.attempts, {columns} FROM jobs j
+            LEFT JOIN subscriptions s ON s.id = j.subscription_id
+            WHERE j.available_at <= ? ORDER BY j.available_at, j.id LIMIT ?
+            """,
+            (now, limit)
+        ).fetchall()
+
+        jobs = []
+        stale = []
+        for row in rows:
+            subscription = Subscription(*row[2:])
+            if subscription.id is None or subscription.next_due is None:
+                stale.append((row[0],))
+            else:
+                jobs.append(Job(row[0], row[1] + 1, subscription))
+
+        conn.executemany("DELETE FROM jobs WHERE id = ?", stale)
+        conn.executemany(
+            "UPDATE jobs SET available_at = ?, worker = ?, attempts = attempts + 1 WHERE id = ?",
+            [(now + lease, worker, job.id) for job in jobs]
+        )
+    return jobs
+
+
+@timed_query
+def extend_job_leases(worker, job_ids, leased_until):
+    """
+    Продлевает аренду заданий, которые воркер ещё выполняет.
+    """
+    with transaction() as conn:
+        conn.executemany(
+            "UPDATE jobs SET available_at = ? WHERE id = ? AND worker = ?",
+            [(leased_until, job_id, worker) for job_id in job_ids]
+        )
+
+
+@timed_query
+def complete_job(job_id, worker):
+    """
+    Удаляет выполненное задание. Возвращает False, если аренда уже истекла и задание
+    досталось другому воркеру.
+    """
+    with transaction() as conn:
+        return conn.execute("DELETE FROM jobs WHERE id = ? AND worker = ?", (job_id, worker)).rowcount > 0
+
+
+@timed_query
+def count_jobs(now):
+    """
+    Число заданий в очереди: (ожидают воркера, в аренде).
+    """
+    return get_connection().execute(
+        "SELECT COALESCE(SUM(available_at <= ?), 0), COALESCE(SUM(available_at > ?), 0) FROM jobs", (now, now)
+    ).fetchone()
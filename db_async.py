@@ -0,0 +1,37 @@
+"""
+Асинхронный доступ к db.py для обработчиков бота: запросы выполняются в отдельном пуле потоков
+и не блокируют цикл событий (у каждого потока пула своё соединение SQLite, см. db.get_connection).
+
+    subscriptions = await db_async.get_subscriptions(user_id)
+    await db_async.run(scheduler.add_user, user_id)
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import db
+
+# SQLite всё равно выполняет записи по одной, поэтому потоков немного
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="db-async")
+
+
+async def run(func, *args, **kwargs):
+    """
+    Выполняет синхронную функцию, работающую с БД, в пуле потоков БД.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+def __getattr__(name):
+    """
+    db_async.<функция> — асинхронная обёртка одноимённой функции db.py.
+    """
+    func = getattr(db, name)
+    if not callable(func):
+        raise AttributeError(name)
+
+    @functools.wraps(func)
+    async def call(*args, **kwargs):
+        return await run(func, *args, **kwargs)
+
+    return call
@@ -0,0 +1,37 @@
+import hashlib
+import threading
+import db
+
+# Запись «сравнить с последней строкой и вставить» должна быть атомарной между потоками мониторинга
+_record_lock = threading.Lock()
+
+# Последняя записанная этим процессом пара (версия, хеш changelog) по (стор, ключ приложения):
+# если данные не изменились, обращаться к БД для сравнения не нужно
+_last_recorded = {}
+
+
+def changelog_hash(changelog):
+    """
+    Короткий хеш текста изменений: хранить сам changelog в истории не нужно.
+    """
+    return hashlib.sha1((changelog or "").encode("utf-8")).hexdigest()
+
+
+def record_snapshot(store, app_key, snapshot):
+    """
+    Сравнивает Snapshot с последней сохранённой строкой истории и добавляет новую, если изменились
+    версия или changelog. Возвращает True, если обнаружено изменение.
+    """
+    new_hash = changelog_hash(snapshot.changelog)
+    if _last_recorded.get((store, app_key)) == (snapshot.version, new_hash):
+        return False
+
+    # Блокировка записи SQLite защищает от гонки и между процессами
+    with _record_lock, db.transaction(immediate=True):
+        latest = db.get_latest_snapshot(store, app_key)
+        changed = not (latest and latest[0] == snapshot.version and latest[2] == new_hash)
+        if changed:
+            db.insert_snapshot(store, app_key, snapshot.version, snapshot.last_updated, new_hash, snapshot.fetched_at)
+
+    _last_recorded[(store, app_key)] = (snapshot.version, new_hash)
+    return changed
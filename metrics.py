@@ -0,0 +1,329 @@
+"""
+Метрики бота в текстовом формате Prometheus.
+
+Счётчики и гистограммы обновляются в горячих путях (загрузка сторов, очередь отправки, запросы к БД),
+значения «на сейчас» (глубина очередей, занятость пула Chrome, отставание планировщика) считаются
+в момент запроса. Эндпоинт включается параметром metrics_port в config.json:
+
+    curl http://127.0.0.1:9105/metrics
+"""
+import bisect
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Границы гистограмм в секундах: загрузки сторов (от HTTP до Selenium) и запросы к SQLite
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+LAG_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name}: ожидались метки {self.label_names}, получены {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [счётчики по корзинам (последняя — +Inf), сумма, количество]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Замеряет время выполнения блока with.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _render_sample(self, key, state):
+        counts, total, count = state
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.label_names, key, [("le", _format_value(float(bound)))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.label_names, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """
+    Набор метрик процесса. Сборщики (collectors) вызываются при каждом запросе /metrics
+    и обновляют значения, которые дешевле посчитать на лету, чем поддерживать в горячем пути.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            existing = self._metrics.setdefault(metric.name, metric)
+        if existing is not metric:
+            raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def add_collector(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        with self._lock:
+            collectors = list(self._collectors)
+            metrics = list(self._metrics.values())
+        for collector in collectors:
+            try:
+                collector()
+            except Exception as e:
+                print(f"Ошибка сборщика метрик {getattr(collector, '__name__', collector)}: {e}")
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# --- Сторы ---
+STORE_FETCH_SECONDS = registry.histogram(
+    "storesnap_store_fetch_seconds", "Время загрузки данных приложения из стора", ["store"]
+)
+STORE_FETCHES = registry.counter(
+    "storesnap_store_fetches_total", "Загрузки из сторов по результату (ok или класс ошибки)", ["store", "result"]
+)
+CONDITIONAL_RESPONSES = registry.counter(
+    "storesnap_conditional_responses_total",
+    "Ответы условных HTTP-запросов: not_modified (304), unchanged (тело не изменилось), parsed",
+    ["result"],
+)
+DRIVER_LEASE_WAIT_SECONDS = registry.histogram(
+    "storesnap_driver_lease_wait_seconds", "Ожидание свободного драйвера Chrome в пуле"
+)
+DRIVER_POOL_DRIVERS = registry.gauge(
+    "storesnap_driver_pool_drivers", "Драйверы Chrome в пуле по состоянию", ["state"]
+)
+BREAKER_OPEN = registry.gauge(
+    "storesnap_store_breaker_open", "Автомат защиты стора разомкнут (1) или пропускает запросы (0)", ["store"]
+)
+
+# --- Мониторинг ---
+SCHEDULER_LAG_SECONDS = registry.histogram(
+    "storesnap_scheduler_lag_seconds", "Отставание проверки от запланированного времени (now - next_due)",
+    buckets=LAG_BUCKETS,
+)
+SCHEDULER_OVERDUE_SECONDS = registry.gauge(
+    "storesnap_scheduler_overdue_seconds", "На сколько просрочена самая старая ожидающая проверка"
+)
+JOBS = registry.gauge("storesnap_jobs", "Задания в очереди воркеров", ["state"])
+SINGLE_CHECK_SECONDS = registry.histogram(
+    "storesnap_single_check_seconds", "Длительность разовой проверки всех приложений пользователя"
+)
+SINGLE_CHECKS = registry.counter(
+    "storesnap_single_checks_total", "Разовые проверки по результату", ["result"]
+)
+
+# --- Telegram ---
+TELEGRAM_QUEUE_DEPTH = registry.gauge("storesnap_telegram_queue_depth", "Сообщения в очереди отправки (outbox)")
+TELEGRAM_MESSAGES = registry.counter(
+    "storesnap_telegram_messages_total",
+    "Сообщения Telegram по результату: enqueued, sent, retried, dropped",
+    ["result"],
+)
+TELEGRAM_RATE_LIMITED = registry.counter("storesnap_telegram_rate_limited_total", "Ответы Telegram 429")
+TELEGRAM_SEND_SECONDS = registry.histogram("storesnap_telegram_send_seconds", "Время запроса sendMessage")
+
+# --- База данных ---
+DB_QUERY_SECONDS = registry.histogram(
+    "storesnap_db_query_seconds", "Время операций с базой данных", ["operation"], buckets=DB_BUCKETS
+)
+
+
+def timed_query(func):
+    """
+    Декоратор функций db.py: время выполнения попадает в storesnap_db_query_seconds{operation=<имя функции>}.
+    """
+    operation = func.__name__
+
+    def wrapper(*args, **kwargs):
+        with DB_QUERY_SECONDS.time(operation=operation):
+            return func(*args, **kwargs)
+
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+
+def observe_fetch(store, started, error=None):
+    """
+    Учитывает загрузку стора, начатую в started (time.perf_counter()).
+    """
+    STORE_FETCH_SECONDS.observe(time.perf_counter() - started, store=store)
+    STORE_FETCHES.inc(store=store, result="ok" if error is None else type(error).__name__)
+
+
+def _collect_runtime():
+    """
+    Значения «на сейчас»: очереди в БД, пул Chrome, автоматы защиты сторов.
+    Модули импортируются здесь, чтобы metrics.py не тянул их при запуске.
+    """
+    import db
+    from stores.breaker import OPEN, store_health
+
+    now = time.time()
+    TELEGRAM_QUEUE_DEPTH.set(db.count_outbox_messages())
+    queued, leased = db.count_jobs(now)
+    JOBS.set(queued, state="queued")
+    JOBS.set(leased, state="leased")
+    SCHEDULER_OVERDUE_SECONDS.set(db.get_overdue_seconds())
+
+    # Пул Chrome есть, только если модуль уже загружен (импорт тянет Selenium)
+    driver_pool = sys.modules.get("stores.driver_pool")
+    pool = driver_pool.current_pool() if driver_pool else None
+    if pool is not None:
+        stats = pool.stats()
+        DRIVER_POOL_DRIVERS.set(stats["in_use"], state="in_use")
+        DRIVER_POOL_DRIVERS.set(stats["idle"], state="idle")
+        DRIVER_POOL_DRIVERS.set(stats["size"], state="capacity")
+
+    for store, health in store_health().items():
+        BREAKER_OPEN.set(int(health["state"] == OPEN), store=store)
+
+
+registry.add_collector(_collect_runtime)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Запросы сборщика метрик не пишем в лог
+
+
+def start_http_server(port, host="127.0.0.1"):
+    """
+    Запускает эндпоинт /metrics в фоновом потоке. Возвращает сервер или None, если порт занят
+    (например, на машине уже работает другой процесс бота).
+    """
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        print(f"Метрики недоступны: не удалось занять {host}:{port} ({e})")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"Метрики: http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+def start_from_config():
+    """
+    Запускает эндпоинт по параметрам metrics_port и metrics_host из config.json (порт 0 — выключено).
+    """
+    from settings import get_setting
+
+    port = get_setting("metrics_port", 0)
+    if port:
+        return start_http_server(port, get_setting("metrics_host", "127.0.0.1"))
+    return None
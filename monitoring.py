@@ -0,0 +1,170 @@
+"""
+Общая логика мониторинга: кеш и координатор загрузок сторов, проверка подписки и рассылка
+уведомлений. Модуль один на процесс, его импортируют планировщик, воркер и интерфейс бота
+(точки входа — new.py и bot.py).
+"""
+from datetime import datetime, timedelta, timezone
+import time
+from stores.appstore import get_versions_appstore_bulk
+from stores.breaker import get_breaker
+from stores.cache import Snapshot, SnapshotCache
+from stores.coordinator import FetchCoordinator
+from stores.keys import STORE_TITLES, get_app_key
+from telegram_utils import wake_send_queue
+from history import record_snapshot
+from metrics import TELEGRAM_MESSAGES
+from settings import get_setting
+from tracing import span
+import db
+
+# Применяем недостающие миграции до первого обращения к БД
+db.migrate()
+
+# Общий кеш данных сторов для мониторинга и разовых проверок
+snapshot_cache = SnapshotCache(
+    ttls=get_setting("cache_ttl", {}),
+    max_bytes=get_setting("cache_max_mb", 16) * 1024 * 1024,
+    persist=get_setting("cache_persist", True),
+)
+
+# Каждое уникальное приложение загружается не чаще раза за TTL, результат делится между всеми подписчиками
+coordinator = FetchCoordinator(snapshot_cache)
+
+# Сторы, которые предзагружаются пачкой на асинхронном движке (без браузера)
+ASYNC_PREFETCH_STORES = ("rustore", "googleplay")
+
+
+def get_current_time(offset_hours=0):
+    """
+    Возвращает текущее время с учетом смещения в часах (по умолчанию +3 часа).
+    """
+    return (datetime.now(timezone.utc) + timedelta(hours=offset_hours)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def prefetch_appstore_versions(urls):
+    """
+    Загружает в координатор версии App Store для переданных ссылок пакетными запросами
+    (по одному набору запросов на страну вместо запроса на каждое приложение).
+    Приложения, уже загруженные в текущем окне, повторно не запрашиваются.
+    """
+    # Группируем приложения по стране: {country: [app_id, ...]}
+    by_country = {}
+    for url in urls:
+        try:
+            app_key = get_app_key("appstore", url)
+        except ValueError:
+            continue
+        if coordinator.is_fresh("appstore", app_key):
+            continue
+        country, app_id = app_key.split(":", 1)
+        by_country.setdefault(country, set()).add(app_id)
+
+    for country, app_ids in by_country.items():
+        try:
+            versions = get_breaker("appstore").call(get_versions_appstore_bulk, app_ids, country)
+        except RuntimeError as e:
+            # Эти приложения будут загружены обычными запросами
+            print(f"Ошибка пакетного запроса App Store ({country}): {e}")
+            continue
+        fetched_at = time.time()
+        for app_id, (version, changelog, last_updated) in versions.items():
+            coordinator.prime("appstore", f"{country}:{app_id}", Snapshot(version, changelog, last_updated, fetched_at))
+
+
+def prefetch_http_snapshots(subscriptions):
+    """
+    Загружает приложения HTTP-сторов (RuStore, Google Play в режиме http) из пачки подписок
+    одновременно на асинхронном движке (stores/aio.py) и передаёт результаты координатору:
+    проверки подписок затем берут данные из кеша, а не ждут загрузки в своих потоках.
+    Ошибка загрузки тоже передаётся координатору и разделяется подписчиками приложения.
+    Выключается параметром async_prefetch в config.json.
+    """
+    if not get_setting("async_prefetch", True):
+        return
+
+    stores = set(ASYNC_PREFETCH_STORES)
+    if get_setting("googleplay_mode", "http") != "http":
+        stores.discard("googleplay")
+
+    # Уникальные приложения без свежих данных: {(стор, ключ приложения): url}
+    items = {}
+    for subscription in subscriptions:
+        key = (subscription.store, subscription.app_key)
+        if subscription.store in stores and key not in items and not coordinator.is_fresh(*key):
+            items[key] = subscription.url
+    if not items:
+        return
+
+    # aiohttp загружается только при первой пачке с HTTP-сторами
+    from stores.aio import fetch_all
+
+    results = fetch_all([(store, url) for (store, _), url in items.items()])
+    for (store, app_key), result in zip(items, results):
+        if isinstance(result, Snapshot):
+            coordinator.prime(store, app_key, result)
+        elif isinstance(result, Exception):
+            coordinator.fail(store, app_key, result)
+
+
+def render_new_version_message(store_name, app_key, snapshot):
+    """
+    Текст уведомления о новой версии приложения (один на всех подписчиков).
+    Приложение указывается ключом, так как у пользователя может быть несколько приложений в одном сторе.
+    """
+    return (
+        f"🎉 Новая версия в {store_name}!\n"
+        f"Приложение: {app_key}\n"
+        f"Версия: {snapshot.version}\n"
+        f"Дата обновления: {snapshot.last_updated}\n"
+        f"Изменения:\n{snapshot.changelog}"
+    )
+
+
+def notify_subscribers(config, store, app_key, snapshot):
+    """
+    Рассылает новую версию всем активным подписчикам приложения, которые о ней ещё не знают:
+    сообщение формируется один раз и ставится в очередь отправки одной пачкой.
+    Возвращает список user_id получателей.
+    """
+    with span("notify", store=store, app_key=app_key, version=snapshot.version) as current:
+        text = render_new_version_message(STORE_TITLES[store], app_key, snapshot)
+        user_ids = db.fan_out_notification(store, app_key, snapshot.version, text)
+        current.set(recipients=len(user_ids))
+    if user_ids:
+        TELEGRAM_MESSAGES.inc(len(user_ids), result="enqueued")
+        wake_send_queue()
+    return user_ids
+
+
+def process_subscription(subscription, config):
+    """
+    Выполняет одну проверку подписки: загружает приложение через общий координатор
+    (популярное приложение загружается один раз на всех) и сохраняет историю версий.
+    Если версия приложения изменилась или эта подписка ещё не знает текущую версию,
+    уведомление сразу получают все подписчики приложения, а не только владелец подписки.
+    Возвращает список user_id, которым отправлено уведомление.
+    """
+    store_name = STORE_TITLES[subscription.store]
+
+    # Получение данных о версиях и обновлениях
+    snapshot = coordinator.fetch(subscription.store, subscription.url)
+
+    # Сохраняем версию в историю приложения, если она изменилась
+    with span("record"):
+        changed = record_snapshot(subscription.store, subscription.app_key, snapshot)
+    db.set_last_monitoring(subscription.user_id, get_current_time(offset_hours=3))
+
+    if not changed and subscription.notified_version == snapshot.version:
+        print(
+            f"Выполнен мониторинг {store_name} для пользователя {subscription.user_id} в {get_current_time(offset_hours=3)}. "
+            f"Новая версия не найдена, сообщение не отправлено."
+        )
+        return []
+
+    user_ids = notify_subscribers(config, subscription.store, subscription.app_key, snapshot)
+    print(
+        f"Выполнен мониторинг {store_name} для пользователя {subscription.user_id} в {get_current_time(offset_hours=3)}. "
+        f"{'Найдена новая версия' if changed else 'Первая проверка — версия найдена'}, "
+        f"сообщений поставлено в очередь: {len(user_ids)}."
+    )
+    return user_ids
@@ -1,41 +1,68 @@
-import subprocess
+import startup_profile  # Первым: отсчёт времени запуска для --profile-startup
 import sys
+
+if startup_profile.is_requested() and "importtime" not in sys._xoptions:
+    sys.exit(startup_profile.profile_imports(__file__))
+
+import asyncio
 import os
 import threading
-import json
 import time
-import sqlite3
-from telebot import TeleBot, types
+from concurrent.futures import ThreadPoolExecutor
+from telebot import types
+from telebot.async_telebot import AsyncTeleBot
 from datetime import datetime, timezone
-from stores.rustore import get_version_rustore
-from stores.appstore import get_version_appstore
-from stores.googleplay import get_version_googleplay
-from stores.appgallery import get_version_appgallery
+from monitoring import coordinator, get_current_time
+from metrics import SINGLE_CHECK_SECONDS, SINGLE_CHECKS, start_from_config as start_metrics_server
+from tracing import span
+from stores.keys import STORE_TITLES, get_app_key
+from stores.registry import close_driver_pool
+from scheduler import MonitoringScheduler
+from settings import load_config
+from telegram_utils import get_send_queue
+import db
+import db_async
 
 # Загрузка конфигурации
-with open("config.json", "r") as file:
-    config = json.load(file)
+config = load_config()
 
-# Токен вашего Telegram-бота
-bot = TeleBot(config["telegram_bot_token"])
+# Токен вашего Telegram-бота. Обработчики асинхронные: запросы к БД идут через db_async,
+# а загрузки сторов — в пуле check_executor, поэтому медленная проверка не задерживает ответы другим
+bot = AsyncTeleBot(config["telegram_bot_token"])
 
-# Путь к основному боту
-BOT_SCRIPT = "bot.py"
+# Планировщик мониторинга для всех подписок (очередь хранится в БД)
+scheduler = MonitoringScheduler(config)
+
+# Пул потоков для загрузки сторов в разовых проверках
+check_executor = ThreadPoolExecutor(max_workers=config.get("check_workers", 8), thread_name_prefix="single-check")
 
 # Переменные для хранения состояния
-bot_process = None
-lock = threading.Lock()
+lock = asyncio.Lock()
 
-# Словари для хранения процессов
+# Словари для хранения сессий
 user_sessions = {}
 check_sessions = {}
 
 
-def get_db_connection():
+class CheckSession:
     """
-    Подключение к базе данных SQLite.
+    Состояние разовой проверки пользователя: флаг отмены, задачи загрузки по сторам
+    и фоновая задача, отправляющая результаты.
     """
-    return sqlite3.connect("store_snap.db")
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+        self.futures = []
+        self.task = None
+
+    def cancel(self):
+        """
+        Отменяет проверку: ещё не начатые загрузки снимаются с очереди,
+        результаты уже выполняющихся больше не отправляются пользователю.
+        """
+        self.cancelled.set()
+        for future in self.futures:
+            future.cancel()
 
 
 def main_menu_keyboard():
@@ -122,20 +149,24 @@ def settings_menu_keyboard():
     return keyboard
 
 
-def has_stores(user_id):
+async def has_stores(user_id):
     """
     Проверяет, указал ли пользователь хотя бы один стор.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT appstore_url, rustore_url, googleplay_url, appgallery_url FROM users WHERE user_id = ?",
-        (user_id,)
-    )
-    user_stores = cursor.fetchone()
-    conn.close()
+    return bool(await db_async.get_subscriptions(user_id))
 
-    return user_stores and any(store is not None and store.strip() != "" for store in user_stores)
+
+def save_subscription(user_id, store, url, replace_store=False):
+    """
+    Сохраняет подписку на приложение. Если у пользователя запущен мониторинг,
+    новое приложение проверяется сразу. Нераспознанная ссылка приводит к ValueError.
+    """
+    url = url.strip()
+    db.add_subscription(
+        user_id, store, get_app_key(store, url), url,
+        replace_store=replace_store, next_due=get_current_time(offset_hours=3)
+    )
+    scheduler.wake()
 
 
 def app_selection_keyboard():
@@ -156,7 +187,7 @@ def app_selection_keyboard():
 
 
 @bot.message_handler(commands=['start'])
-def start_command(message):
+async def start_command(message):
     """
     Команда /start: приветствие с созданием записи в БД.
     """
@@ -165,44 +196,20 @@ def start_command(message):
     last_name = message.from_user.last_name or ""
     full_name = f"{first_name} {last_name}".strip()
 
-    # Подключение к базе данных
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # Проверяем, есть ли строка для пользователя
-    cursor.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
-    user = cursor.fetchone()
-
-    if not user:
-        # Если строки нет, создаем новую с `full_name`
-        cursor.execute(
-            """
-            INSERT INTO users (user_id, appstore_url, rustore_url, googleplay_url, appgallery_url, interval, full_name)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            """,
-            (user_id, None, None, None, None, 10, full_name)  # Дефолтный интервал — 10 минут
-        )
-        conn.commit()
-        bot.send_message(user_id, "Вы успешно зарегистрированы в боте!🎉")
-
+    # Если строки нет, создаем новую с `full_name` (дефолтный интервал — 10 минут)
+    if await db_async.create_user(user_id, full_name):
+        await bot.send_message(user_id, "Вы успешно зарегистрированы в боте!🎉")
     else:
         # Обновляем `full_name` на случай изменения имени пользователя
-        cursor.execute(
-            "UPDATE users SET full_name = ? WHERE user_id = ?",
-            (full_name, user_id)
-        )
-        conn.commit()
+        await db_async.update_full_name(user_id, full_name)
 
     # Приветственное сообщение
-    bot.send_message(
+    await bot.send_message(
         user_id,
         f"Добро пожаловать в Store Snap! ❤️",
         reply_markup=main_menu_keyboard()
     )
 
-    # Закрытие соединения
-    conn.close()
-
 
 def utc_to_local(utc_dt):
     """
@@ -219,133 +226,83 @@ def get_current_utc_time():
 
 
 @bot.message_handler(commands=['check'])
-def check_command(message):
+async def check_command(message):
     """
     Обработка команды /check.
     Если у пользователя не указано ни одно приложение, отправляется предупреждение.
     """
-    user_id = message.chat.id
-
-    # Подключение к базе данных
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # Проверяем, указаны ли приложения для пользователя
-    cursor.execute(
-        "SELECT appstore_url, rustore_url, googleplay_url, appgallery_url FROM users WHERE user_id = ?",
-        (user_id,)
-    )
-    user_stores = cursor.fetchone()
-    conn.close()
-
-    # Проверяем, есть ли хотя бы одно указанное приложение
-    if not user_stores or all(store is None or store.strip() == "" for store in user_stores):
-        bot.send_message(
-            user_id,
-            "Вы не указали ни одно приложение для проверки :("
-        )
-        return
-
-    # Если хотя бы одно приложение указано
-    bot.send_message(user_id, "Начинаю проверку сторов...⏳")
-    try:
-        results = perform_single_check(user_id)
-        if not results or not results.strip():  # Если результат None или пустой
-            bot.send_message(user_id, "Не удалось получить данные о сторах.")
-        else:
-            bot.send_message(user_id, results)
-    except Exception as e:
-        bot.send_message(user_id, f"Ошибка при выполнении проверки: {str(e)}")
+    await start_single_check(message.chat.id)
 
 
 @bot.message_handler(func=lambda message: message.text == "Запустить мониторинг")
-def start_monitoring_handler(message):
+async def start_monitoring_handler(message):
     """
     Обработчик кнопки "Запустить мониторинг".
     Проверяет, указаны ли сторы перед началом мониторинга и запускает мониторинг только для текущего пользователя.
     """
     user_id = message.chat.id
 
-    # Подключение к базе данных
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # Получаем ссылки на приложения из БД для текущего пользователя
-    cursor.execute(
-        "SELECT appstore_url, rustore_url, googleplay_url, appgallery_url, interval FROM users WHERE user_id = ?",
-        (user_id,)
-    )
-    user_stores = cursor.fetchone()
-    conn.close()
-
     # Проверяем, есть ли хотя бы один указанный стор
-    if not user_stores or all(store is None or store.strip() == "" for store in user_stores[:4]):
-        bot.send_message(
+    if not await has_stores(user_id):
+        await bot.send_message(
             user_id,
             "Вы не указали ни одно приложение для мониторинга :("
         )
         return
 
-    # Если хотя бы одно приложение указано, запускаем мониторинг
-    with lock:
-        if user_id in user_sessions and user_sessions[user_id].poll() is None:
-            bot.send_message(user_id, "Мониторинг уже запущен!", reply_markup=stop_monitoring_keyboard())
-            return
-
-        # Формируем аргументы для subprocess с конкретным пользователем
-        args = ["python3", BOT_SCRIPT, f"--user_id={user_id}"]
-        try:
-            process = subprocess.Popen(args)
-            user_sessions[user_id] = process
-
-            # Логируем запуск мониторинга
-            current_time = time.strftime("%Y-%m-%d %H:%M:%S")
-            print(f"Пользователь {user_id} запустил мониторинг в {current_time}")
+    # Если хотя бы одно приложение указано, запускаем мониторинг.
+    # Блокировка держится только на время работы с БД, ответ отправляется после неё
+    error = None
+    async with lock:
+        already_scheduled = await db_async.run(scheduler.is_scheduled, user_id)
+        if not already_scheduled:
+            # Ставим пользователя в очередь планировщика
+            try:
+                await db_async.run(scheduler.add_user, user_id)
+            except Exception as e:
+                error = e
+
+    if already_scheduled:
+        await bot.send_message(user_id, "Мониторинг уже запущен!", reply_markup=stop_monitoring_keyboard())
+    elif error is not None:
+        await bot.send_message(user_id, f"Ошибка при запуске мониторинга: {str(error)}")
+    else:
+        # Логируем запуск мониторинга
+        current_time = time.strftime("%Y-%m-%d %H:%M:%S")
+        print(f"Пользователь {user_id} запустил мониторинг в {current_time}")
 
-            bot.send_message(user_id, "Мониторинг успешно запущен! 🚀", reply_markup=stop_monitoring_keyboard())
-        except Exception as e:
-            bot.send_message(user_id, f"Ошибка при запуске мониторинга: {str(e)}")
+        await bot.send_message(user_id, "Мониторинг успешно запущен! 🚀", reply_markup=stop_monitoring_keyboard())
 
 
 @bot.message_handler(func=lambda message: message.text == "Остановить мониторинг")
-def stop_monitoring_handler(message):
+async def stop_monitoring_handler(message):
     """
     Обработчик кнопки "Остановить мониторинг".
     """
-    global bot_process
-    with lock:
-        user_id = message.chat.id
-        if user_id in user_sessions and user_sessions[user_id].poll() is None:
-            # Завершаем процесс мониторинга
-            user_sessions[user_id].terminate()
-            del user_sessions[user_id]
-
-            # Обнуляем next_monitoring в базе данных
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute(
-                "UPDATE users SET next_monitoring = NULL WHERE user_id = ?",
-                (user_id,)
-            )
-            conn.commit()
-            conn.close()
-
-            # Логируем остановку мониторинга
-            current_time = time.strftime("%Y-%m-%d %H:%M:%S")
-            print(f"Пользователь {user_id} остановил мониторинг в {current_time}")
-
-            bot.send_message(user_id, "Мониторинг остановлен! 🛑", reply_markup=main_menu_keyboard())
-        else:
-            bot.send_message(user_id, "Мониторинг не запущен", reply_markup=main_menu_keyboard())
+    user_id = message.chat.id
+    async with lock:
+        scheduled = await db_async.run(scheduler.is_scheduled, user_id)
+        if scheduled:
+            # Снимаем подписки пользователя с расписания (next_due в БД обнуляется)
+            await db_async.run(scheduler.remove_user, user_id)
+
+    if scheduled:
+        # Логируем остановку мониторинга
+        current_time = time.strftime("%Y-%m-%d %H:%M:%S")
+        print(f"Пользователь {user_id} остановил мониторинг в {current_time}")
+
+        await bot.send_message(user_id, "Мониторинг остановлен! 🛑", reply_markup=main_menu_keyboard())
+    else:
+        await bot.send_message(user_id, "Мониторинг не запущен", reply_markup=main_menu_keyboard())
 
 
 @bot.message_handler(func=lambda message: message.text == "Настройки")
-def bot_settings_handler(message):
+async def bot_settings_handler(message):
     """
     Обработчик кнопки "Настройки".
     Переход в раздел настроек.
     """
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "Выберите, что хотите настроить ⚙️",
         reply_markup=settings_menu_keyboard()  # Клавиатура для настроек
@@ -353,12 +310,12 @@ def bot_settings_handler(message):
 
 
 @bot.message_handler(func=lambda message: message.text == "Магазины")
-def set_app_button_handler(message):
+async def set_app_button_handler(message):
     """
     Обработчик кнопки "Магазины".
     Переходит к выбору стора.
     """
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "Добавьте или измените магазины приложений 🛍️",
         reply_markup=app_selection_keyboard()  # Клавиатура с кнопкой "⏪ Назад"
@@ -366,12 +323,12 @@ def set_app_button_handler(message):
 
 
 @bot.message_handler(func=lambda message: message.text in ["App Store", "RuStore", "Google Play", "AppGallery", "Отмена"])
-def store_selection_handler(message):
+async def store_selection_handler(message):
     """
     Обработчик выбора конкретного стора или выхода из меню.
     """
     if message.text == "Отмена":
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             "Добавьте или измените магазины приложений 🛍️",
             reply_markup=app_selection_keyboard()  # Клавиатура с кнопками магазинов
@@ -391,7 +348,7 @@ def store_selection_handler(message):
 
     user_sessions[message.chat.id] = {"store": selected_store}
 
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         f"Введите ссылку для {message.text}",
         reply_markup=cancel_keyboard()
@@ -399,13 +356,13 @@ def store_selection_handler(message):
 
 
 @bot.message_handler(func=lambda message: message.chat.id in user_sessions and "store" in user_sessions[message.chat.id])
-def set_app_link_handler(message):
+async def set_app_link_handler(message):
     """
     Обработчик ввода ссылки для выбранного стора.
     """
     # Если пользователь нажимает "⏪ Назад", возвращаем его в меню настроек
     if message.text == "⏪ Назад":
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             "Выберите, что хотите настроить ⚙️",
             reply_markup=settings_menu_keyboard()
@@ -425,7 +382,7 @@ def set_app_link_handler(message):
 
     # Проверяем валидность ссылки (примитивная проверка на наличие протокола)
     if not message.text.startswith("http"):
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             "Пожалуйста, введите корректную ссылку, начинающуюся с 'http'"
         )
@@ -433,16 +390,9 @@ def set_app_link_handler(message):
 
     # Сохраняем ссылку в базе данных
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            f"UPDATE users SET {selected_store}_url = ? WHERE user_id = ?",
-            (message.text, message.chat.id)
-        )
-        conn.commit()
-        conn.close()
+        await db_async.run(save_subscription, message.chat.id, selected_store, message.text, replace_store=True)
 
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             f"Ссылка для {store_mapping[selected_store]} успешно сохранена! 🎉",
             reply_markup=settings_menu_keyboard()
@@ -452,18 +402,18 @@ def set_app_link_handler(message):
         del user_sessions[message.chat.id]
 
     except Exception as e:
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             f"Ошибка при сохранении ссылки: {e}"
         )
 
 
 @bot.message_handler(func=lambda message: message.text == "Частота обновлений")
-def set_interval_button_handler(message):
+async def set_interval_button_handler(message):
     """
     Обработчик кнопки "Частота обновлений".
     """
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "Укажите интервал обновления в минутах (по умолчанию 10) ⏱️",
         reply_markup=only_back_keyboard()
@@ -472,12 +422,12 @@ def set_interval_button_handler(message):
 
 
 @bot.message_handler(func=lambda message: message.chat.id in user_sessions and user_sessions[message.chat.id].get("awaiting_interval"))
-def set_interval_handler(message):
+async def set_interval_handler(message):
     """
     Обработчик ввода интервала обновления.
     """
     if message.text == "⏪ Назад":
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             "Выберите, что хотите настроить ⚙️",
             reply_markup=settings_menu_keyboard()
@@ -486,7 +436,7 @@ def set_interval_handler(message):
         return
 
     if not message.text.isdigit():
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             "Пожалуйста, введите целое число от 1 до 1440"
         )
@@ -494,23 +444,16 @@ def set_interval_handler(message):
 
     interval = int(message.text)
     if interval < 1 or interval > 1440:
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             "Интервал должен быть в диапазоне от 1 до 1440 минут"
         )
         return
 
     # Сохраняем интервал в базе данных
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE users SET interval = ? WHERE user_id = ?",
-        (interval, message.chat.id)
-    )
-    conn.commit()
-    conn.close()
+    await db_async.set_interval(message.chat.id, interval)
 
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         f"Интервал обновления успешно установлен: {interval} минут",
         reply_markup=settings_menu_keyboard()
@@ -519,11 +462,11 @@ def set_interval_handler(message):
 
 
 @bot.message_handler(func=lambda message: message.text == "О проекте")
-def about_project_handler(message):
+async def about_project_handler(message):
     """
     Обработчик кнопки "О проекте".
     """
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "Store Snap — это бот для мониторинга обновлений приложений в RuStore, App Store, Google Play и AppGallery 🚀\n\n"
         "Обратная связь: @vanyabooo",
@@ -532,12 +475,12 @@ def about_project_handler(message):
 
 
 @bot.message_handler(func=lambda message: message.text == "Отзывы")
-def reviews_handler(message):
+async def reviews_handler(message):
     """
     Обработчик кнопки "Отзывы".
     Выводит сообщение о том, что раздел в разработке, и добавляет кнопку для возврата в главное меню.
     """
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "Еще в разработке, не все так быстро, бро 🛠️",
         reply_markup=back_to_main_menu_keyboard()
@@ -545,12 +488,12 @@ def reviews_handler(message):
 
 
 @bot.message_handler(func=lambda message: message.text == "↩️ Назад в меню")
-def back_to_main_menu_handler(message):
+async def back_to_main_menu_handler(message):
     """
     Обработчик кнопки "↩️ Назад в меню".
     Возвращает пользователя в главное меню из любого подменю.
     """
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "Возвращаемся в главное меню",
         reply_markup=main_menu_keyboard()  # Возвращает клавиатуру главного меню
@@ -558,12 +501,12 @@ def back_to_main_menu_handler(message):
 
 
 @bot.message_handler(func=lambda message: message.text == "Руководство")
-def show_guide_handler(message):
+async def show_guide_handler(message):
     """
     Обработчик кнопки "Руководство".
     Выводит инструкцию по работе с ботом и кнопку для возврата в главное меню.
     """
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         guide_text,
         reply_markup=back_to_main_menu_keyboard(),  # Клавиатура с кнопкой "↩️ Назад в меню"
@@ -572,12 +515,12 @@ def show_guide_handler(message):
 
 
 @bot.message_handler(func=lambda message: message.text == "⏪ Назад")
-def back_to_settings_handler(message):
+async def back_to_settings_handler(message):
     """
     Обработчик кнопки "⏪ Назад" из раздела выбора стора.
     Возвращает пользователя в раздел "Настройки".
     """
-    bot.send_message(
+    await bot.send_message(
         message.chat.id,
         "Выберите, что хотите настроить ⚙️",
         reply_markup=settings_menu_keyboard()  # Возвращение в "Настройки"
@@ -585,63 +528,31 @@ def back_to_settings_handler(message):
 
 
 @bot.message_handler(func=lambda message: message.text == "Разовая проверка")
-def check_stores_handler(message):
+async def check_stores_handler(message):
     """
     Обработчик кнопки "Разовая проверка".
     Если у пользователя не указано ни одно приложение, отправляется предупреждение.
     """
-    user_id = message.chat.id
-
-    # Подключение к базе данных
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # Проверяем, указаны ли приложения для пользователя
-    cursor.execute(
-        "SELECT appstore_url, rustore_url, googleplay_url, appgallery_url FROM users WHERE user_id = ?",
-        (user_id,)
-    )
-    user_stores = cursor.fetchone()
-    conn.close()
-
-    # Проверяем, есть ли хотя бы одно указанное приложение
-    if not user_stores or all(store is None or store.strip() == "" for store in user_stores):
-        bot.send_message(
-            user_id,
-            "Вы не указали ни одно приложение для проверки :("
-        )
-        return
-
-    # Если хотя бы одно приложение указано
-    bot.send_message(user_id, "Начинаю проверку сторов...⏳")
-    try:
-        results = perform_single_check(user_id)
-        if not results or not results.strip():  # Если результат None или пустой
-            bot.send_message(user_id, "Не удалось получить данные о сторах.")
-        else:
-            bot.send_message(user_id, results)
-            # Добавляем сообщение после успешной проверки
-            bot.send_message(user_id, "Проверка успешно завершена! ✅")
-    except Exception as e:
-        bot.send_message(user_id, f"Ошибка при выполнении проверки: {str(e)}")
+    await start_single_check(message.chat.id)
 
 
 @bot.message_handler(func=lambda message: message.text == "Остановить проверку")
-def stop_check_handler(message):
+async def stop_check_handler(message):
     """
     Обработчик кнопки "Остановить проверку".
     """
-    global check_sessions
-    with lock:
-        if message.chat.id in check_sessions:
-            del check_sessions[message.chat.id]
-            bot.send_message(message.chat.id, "Проверка остановлена!🛑", reply_markup=main_menu_keyboard())
-        else:
-            bot.send_message(message.chat.id, "Проверка уже завершена.", reply_markup=main_menu_keyboard())
+    async with lock:
+        session = check_sessions.pop(message.chat.id, None)
+
+    if session:
+        session.cancel()
+        await bot.send_message(message.chat.id, "Проверка остановлена!🛑", reply_markup=main_menu_keyboard())
+    else:
+        await bot.send_message(message.chat.id, "Проверка уже завершена.", reply_markup=main_menu_keyboard())
 
 
 @bot.message_handler(commands=['set_app'])
-def set_app_command(message):
+async def set_app_command(message):
     """
     Устанавливает ссылку на приложение для указанного стора.
     Пример: /set_app appstore https://apps.apple.com/ru/app/example
@@ -649,7 +560,7 @@ def set_app_command(message):
     args = message.text.split(maxsplit=2)  # Разделяем команду на части
 
     if len(args) != 3:  # Если недостаточно аргументов
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             "Пожалуйста, укажите стор и ссылку на приложение. Пример:\n"
             "/set_app appstore https://apps.apple.com/ru/app/example"
@@ -661,7 +572,7 @@ def set_app_command(message):
     # Проверяем, что указано корректное имя стора
     valid_stores = ["appstore", "rustore", "googleplay", "appgallery"]
     if store_name not in valid_stores:
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             f"Недопустимый стор: {store_name}. Пожалуйста, используйте одно из следующих значений:\n"
             f"{', '.join(valid_stores)}"
@@ -670,52 +581,45 @@ def set_app_command(message):
 
     # Сохраняем данные в базу
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Проверяем, существует ли пользователь
-        cursor.execute("SELECT * FROM users WHERE user_id = ?", (message.chat.id,))
-        user = cursor.fetchone()
-
-        if user:
-            # Обновляем ссылку для указанного стора
-            cursor.execute(
-                f"UPDATE users SET {store_name}_url = ? WHERE user_id = ?",
-                (store_url, message.chat.id)
-            )
-        else:
-            # Если пользователя нет в БД, создаём запись с указанным стором
-            cursor.execute(
-                f"""
-                INSERT INTO users (user_id, appstore_url, rustore_url, googleplay_url, appgallery_url, interval)
-                VALUES (?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    message.chat.id,
-                    store_url if store_name == "appstore" else None,
-                    store_url if store_name == "rustore" else None,
-                    store_url if store_name == "googleplay" else None,
-                    store_url if store_name == "appgallery" else None,
-                    10  # Дефолтный интервал — 10 минут
-                )
-            )
-
-        conn.commit()
-        bot.send_message(
+        # Заменяем приложения указанного стора (если пользователя нет в БД, запись создаётся)
+        await db_async.run(save_subscription, message.chat.id, store_name, store_url, replace_store=True)
+        await bot.send_message(
             message.chat.id,
             f"Стор {store_name} успешно обновлён! 🎉"
         )
     except Exception as e:
-        bot.send_message(
+        await bot.send_message(
             message.chat.id,
             f"Ошибка при сохранении данных: {e}"
         )
-    finally:
-        conn.close()
+
+
+@bot.message_handler(commands=['add_app'])
+async def add_app_command(message):
+    """
+    Добавляет ещё одно приложение для отслеживания, не заменяя уже указанные в этом сторе.
+    Пример: /add_app googleplay https://play.google.com/store/apps/details?id=com.example
+    """
+    args = message.text.split(maxsplit=2)
+
+    if len(args) != 3 or args[1] not in STORE_TITLES:
+        await bot.send_message(
+            message.chat.id,
+            "Пожалуйста, укажите стор и ссылку на приложение. Пример:\n"
+            "/add_app googleplay https://play.google.com/store/apps/details?id=com.example\n"
+            f"Доступные сторы: {', '.join(STORE_TITLES)}"
+        )
+        return
+
+    try:
+        await db_async.run(save_subscription, message.chat.id, args[1], args[2])
+        await bot.send_message(message.chat.id, f"Приложение добавлено в {STORE_TITLES[args[1]]}! 🎉")
+    except Exception as e:
+        await bot.send_message(message.chat.id, f"Ошибка при сохранении данных: {e}")
 
 
 @bot.message_handler(commands=['set_interval'])
-def set_interval_command(message):
+async def set_interval_command(message):
     """
     Команда для установки интервала обновления.
     """
@@ -724,91 +628,157 @@ def set_interval_command(message):
 
     # Проверка аргумента
     if len(args) != 2 or not args[1].isdigit():
-        bot.send_message(user_id, "Пожалуйста, укажите интервал в минутах (например: /set_interval 10).")
+        await bot.send_message(user_id, "Пожалуйста, укажите интервал в минутах (например: /set_interval 10).")
         return
 
     interval = int(args[1])
     if interval < 1 or interval > 1440:
-        bot.send_message(user_id, "Интервал должен быть от 1 до 1440 минут.")
+        await bot.send_message(user_id, "Интервал должен быть от 1 до 1440 минут.")
         return
 
     # Обновление интервала в БД
-    conn = sqlite3.connect("store_snap.db")
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE users SET interval = ? WHERE user_id = ?",
-        (interval, user_id)
-    )
-    conn.commit()
-    conn.close()
+    await db_async.set_interval(user_id, interval)
 
-    bot.send_message(user_id, f"Интервал обновления успешно установлен: {interval} минут")
+    await bot.send_message(user_id, f"Интервал обновления успешно установлен: {interval} минут")
 
 
-def perform_single_check(chat_id):
+@bot.message_handler(commands=['set_max_interval'])
+async def set_max_interval_command(message):
     """
-    Логика однократной проверки всех сторов для конкретного пользователя.
+    Команда для установки потолка интервала в адаптивном режиме мониторинга:
+    приложения без обновлений проверяются реже, но не реже указанного.
     """
-    try:
-        # Логирование выполнения проверки
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        print(f"Пользователь {chat_id} выполнил проверку сторов в {current_time}")
-
-        # Подключение к базе данных
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Получаем ссылки на приложения из БД для текущего пользователя
-        cursor.execute(
-            "SELECT appstore_url, rustore_url, googleplay_url, appgallery_url FROM users WHERE user_id = ?",
-            (chat_id,)
+    user_id = message.chat.id
+    args = message.text.split()
+
+    # Проверка аргумента
+    if len(args) != 2 or not args[1].isdigit():
+        await bot.send_message(user_id, "Пожалуйста, укажите максимальный интервал в минутах (например: /set_max_interval 240).")
+        return
+
+    max_interval = int(args[1])
+    if max_interval < 1 or max_interval > 1440:
+        await bot.send_message(user_id, "Интервал должен быть от 1 до 1440 минут.")
+        return
+
+    await db_async.set_max_interval(user_id, max_interval)
+
+    await bot.send_message(user_id, f"Максимальный интервал проверки установлен: {max_interval} минут")
+
+
+async def start_single_check(user_id):
+    """
+    Запускает разовую проверку фоновой задачей, чтобы обработчик сразу освободил цикл событий.
+    Если у пользователя не указано ни одно приложение, отправляется предупреждение.
+    """
+    subscriptions = await db_async.get_subscriptions(user_id)
+    if not subscriptions:
+        await bot.send_message(
+            user_id,
+            "Вы не указали ни одно приложение для проверки :("
         )
-        user_stores = cursor.fetchone()
-        conn.close()
+        return
+
+    async with lock:
+        already_running = user_id in check_sessions
+        if not already_running:
+            session = check_sessions[user_id] = CheckSession()
+
+    if already_running:
+        await bot.send_message(user_id, "Проверка уже выполняется ⏳", reply_markup=stop_check_keyboard())
+        return
 
-        if not user_stores or all(store is None or store.strip() == "" for store in user_stores):
-            return "Вы не указали ни одно приложение для проверки :("
+    await bot.send_message(user_id, "Начинаю проверку сторов...⏳", reply_markup=stop_check_keyboard())
+    session.task = asyncio.create_task(perform_single_check(user_id, subscriptions, session))
 
-        # Список доступных функций для проверки
-        store_functions = {
-            "appstore": get_version_appstore,
-            "rustore": get_version_rustore,
-            "googleplay": get_version_googleplay,
-            "appgallery": get_version_appgallery
-        }
 
-        store_names = ["AppStore", "RuStore", "GooglePlay", "AppGallery"]
+def format_check_title(subscription):
+    """
+    Название проверяемого приложения: стор и ключ приложения (в одном сторе их может быть несколько).
+    """
+    return f"{STORE_TITLES[subscription.store]} ({subscription.app_key})"
+
+
+def format_check_result(store_name, snapshot):
+    """
+    Текст сообщения с результатом проверки одного приложения.
+    """
+    version, changelog, last_updated, _ = snapshot
+    return (
+        f"🎉 {store_name}\n"
+        f"Версия: {version}\n"
+        f"Дата обновления: {last_updated}\n"
+        f"Изменения:\n{changelog}"
+    )
 
-        results = []
 
-        # Проверяем сторы только для текущего пользователя
-        for store_name, store_url, store_function in zip(store_names, user_stores, store_functions.values()):
-            if store_url and store_url.strip():  # Если стор указан
+def fetch_for_check(chat_id, subscription):
+    """
+    Загрузка одного стора в разовой проверке (отдельная трасса на каждый стор).
+    """
+    with span("single_check", store=subscription.store, app_key=subscription.app_key, user_id=chat_id):
+        return coordinator.fetch(subscription.store, subscription.url)
+
+
+async def perform_single_check(chat_id, subscriptions, session):
+    """
+    Логика однократной проверки всех приложений пользователя.
+    Сторы загружаются параллельно (данные берутся из общего кеша, если они свежие),
+    результат каждого стора отправляется сразу по готовности. Вся проверка ограничена
+    check_deadline секунд и прерывается кнопкой "Остановить проверку".
+    """
+    # Логирование выполнения проверки
+    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"Пользователь {chat_id} выполнил проверку сторов в {current_time}")
+
+    started = time.perf_counter()
+    result = "cancelled"
+    loop = asyncio.get_running_loop()
+    futures = {}
+    try:
+        for subscription in subscriptions:
+            future = loop.run_in_executor(check_executor, fetch_for_check, chat_id, subscription)
+            futures[future] = format_check_title(subscription)
+            session.futures.append(future)
+
+        # Результат каждого стора отправляется по готовности
+        pending = set(futures)
+        deadline = loop.time() + config.get("check_deadline", 60)
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=deadline - loop.time(), return_when=asyncio.FIRST_COMPLETED)
+            if session.cancelled.is_set():
+                return
+
+            if not done:
+                result = "timeout"
+                session.cancel()
+                await bot.send_message(
+                    chat_id,
+                    f"Не дождались ответа от: {', '.join(futures[future] for future in pending)}. Попробуйте позже.",
+                    reply_markup=main_menu_keyboard()
+                )
+                return
+
+            for future in done:
+                store_name = futures[future]
                 try:
-                    # Получаем данные о версии, дате обновления и changelog
-                    data = store_function(store_url)
-                    if store_name in ["AppStore", "RuStore", "GooglePlay"]:
-                        version, changelog, last_updated = data
-                    elif store_name == "AppGallery":
-                        version, last_updated, changelog = data
-
-                    results.append(
-                        f"🎉 {store_name}\n"
-                        f"Версия: {version}\n"
-                        f"Дата обновления: {last_updated}\n"
-                        f"Изменения:\n{changelog}"
-                    )
+                    await bot.send_message(chat_id, format_check_result(store_name, future.result()))
                 except Exception as e:
-                    results.append(f"Ошибка при проверке {store_name}: {str(e)}")
+                    await bot.send_message(chat_id, f"Ошибка при проверке {store_name}: {str(e)}")
 
-        if not results:
-            return "Нет данных о сторах."
-
-        # Возвращаем результат проверки
-        return "\n\n".join(results)
+        await bot.send_message(chat_id, "Проверка успешно завершена! ✅", reply_markup=main_menu_keyboard())
+        result = "ok"
 
     except Exception as e:
-        return f"Ошибка при выполнении проверки: {str(e)}"
+        result = "error"
+        session.cancel()
+        await bot.send_message(chat_id, f"Ошибка при выполнении проверки: {str(e)}", reply_markup=main_menu_keyboard())
+    finally:
+        SINGLE_CHECK_SECONDS.observe(time.perf_counter() - started)
+        SINGLE_CHECKS.inc(result=result)
+        async with lock:
+            if check_sessions.get(chat_id) is session:
+                del check_sessions[chat_id]
 
 
 guide_text = (
@@ -852,13 +822,40 @@ guide_text = (
 )
 
 #Polling + restart
+# Пауза перед перезапуском, чтобы повторяющаяся сразу ошибка (например, нет сети) не перезапускала бота в цикле
+RESTART_DELAY = 5
+
+
 def restart_bot():
     print("Перезапуск бота...")
+    # os.execv не выполняет обработчики atexit — браузеры пула закрываем сами
+    close_driver_pool()
+    time.sleep(RESTART_DELAY)
     os.execv(sys.executable, ['python'] + sys.argv)
 
-while True:
-    try:
-        bot.infinity_polling(timeout=50, long_polling_timeout=100)
-    except Exception as e:
-        print(f"Ошибка: {e}")
-        restart_bot()
\ No newline at end of file
+if startup_profile.is_requested():
+    startup_profile.report("new.py")
+    sys.exit(0)
+
+
+async def main():
+    start_metrics_server()
+    # Очередь уведомлений: сначала досылаем сообщения, оставшиеся в БД после прошлого запуска
+    get_send_queue(config["telegram_bot_token"])
+    scheduler.start()
+
+    if config.get("webhook_enabled", False):
+        from webhook import serve_webhook
+        await serve_webhook(bot, config)
+    else:
+        await bot.infinity_polling(timeout=50, request_timeout=100)
+
+
+# Процесс перезапускается и после ошибки, и после завершения опроса: цикл событий
+# и блокировки asyncio нельзя повторно использовать, поэтому бот запускается заново целиком
+try:
+    asyncio.run(main())
+    print("Опрос Telegram завершился")
+except Exception as e:
+    print(f"Ошибка: {e}")
+restart_bot()
\ No newline at end of file
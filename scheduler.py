@@ -0,0 +1,215 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from monitoring import get_current_time, process_subscription, prefetch_appstore_versions, prefetch_http_snapshots
+from cadence import adaptive_next_due
+from metrics import SCHEDULER_LAG_SECONDS
+from settings import get_setting
+from stores.registry import close_driver_pool
+from tracing import span
+import db
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Как часто планировщик заглядывает в БД, даже если ближайшая проверка ещё не скоро
+# (подписки могут добавляться другими процессами)
+MAX_IDLE_SECONDS = 60
+
+# Пауза после ошибки БД в цикле (например, «database is locked»), прежде чем повторить запрос
+ERROR_BACKOFF_SECONDS = 5
+
+# Режимы мониторинга: local — проверки выполняются в этом процессе,
+# queue — планировщик только ставит задания в таблицу jobs, проверки выполняют воркеры (bot.py --worker)
+LOCAL_MODE = "local"
+QUEUE_MODE = "queue"
+
+
+def check_subscription(subscription, config, adaptive=False):
+    """
+    Выполняет проверку подписки. Следующее время уже выставлено при выборке из очереди
+    (в адаптивном режиме оно пересчитывается после проверки), при ошибке проверка
+    повторяется через 15 минут.
+    """
+    try:
+        with span("check", store=subscription.store, app_key=subscription.app_key,
+                  user_id=subscription.user_id, subscription_id=subscription.id):
+            process_subscription(subscription, config)
+        if adaptive:
+            db.delay_subscription(subscription.id, adaptive_next_due(subscription, db.get_user(subscription.user_id)))
+    except Exception as e:
+        print(f"Ошибка мониторинга подписки {subscription.store} пользователя {subscription.user_id}: {e}")
+        db.delay_subscription(subscription.id, get_current_time(offset_hours=3.25))
+
+
+def observe_lag(subscription, now):
+    """
+    Записывает в метрику, на сколько проверка подписки отстала от запланированного next_due.
+    """
+    SCHEDULER_LAG_SECONDS.observe(
+        (datetime.strptime(now, TIME_FORMAT) - datetime.strptime(subscription.next_due, TIME_FORMAT)).total_seconds()
+    )
+
+
+class MonitoringScheduler:
+    """
+    Планировщик мониторинга в рамках одного процесса.
+    Очередь хранится в таблице subscriptions: планировщик забирает подписки с наступившим
+    next_due запросом по индексу и выполняет проверки на ограниченном пуле потоков.
+    Забирается не больше подписок, чем свободных потоков: если проверки не успевают,
+    остальные подписки ждут в БД со своим next_due, а не в памяти процесса.
+    В режиме queue проверки не выполняются, а ставятся заданиями в таблицу jobs для воркеров.
+    """
+
+    def __init__(self, config, max_workers=None, batch_size=100, adaptive=None, mode=None):
+        self.config = config
+        self.mode = mode or config.get("monitoring_mode", LOCAL_MODE)
+        self.max_workers = max_workers or config.get("monitoring_workers", 4)
+        self.batch_size = batch_size
+        # Адаптивный режим: интервал каждой подписки подбирается по ритму обновлений приложения (cadence.py)
+        self.adaptive = get_setting("adaptive_polling", False) if adaptive is None else adaptive
+
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="monitoring")
+        self._thread = None
+        self._stopped = False
+        self._in_flight = 0  # Забранные подписки, проверка которых ещё не завершилась
+
+    def start(self):
+        """
+        Запускает поток планировщика. Состояние очереди уже лежит в БД, восстанавливать его не нужно.
+        """
+        self._thread = threading.Thread(target=self._loop, name="monitoring-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Останавливает планировщик, дожидаясь завершения текущих проверок, и закрывает пул Chrome.
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self._executor.shutdown(wait=True)
+        close_driver_pool()
+
+    def join(self):
+        """
+        Блокирует вызывающий поток до остановки планировщика.
+        """
+        if self._thread:
+            self._thread.join()
+
+    def add_user(self, user_id):
+        """
+        Ставит все подписки пользователя на немедленную проверку.
+        """
+        db.start_monitoring(user_id, get_current_time(offset_hours=3))
+        self.wake()
+
+    def remove_user(self, user_id):
+        """
+        Снимает подписки пользователя с расписания.
+        """
+        db.stop_monitoring(user_id)
+
+    def is_scheduled(self, user_id):
+        """
+        Проверяет, запущен ли мониторинг для пользователя.
+        """
+        return db.is_monitoring(user_id)
+
+    def wake(self):
+        """
+        Будит цикл планировщика (например, после добавления подписки).
+        """
+        with self._condition:
+            self._condition.notify_all()
+
+    def _loop(self):
+        """
+        Основной цикл: забирает подписки с наступившим next_due и отдаёт их в пул потоков
+        (или ставит заданиями в очередь воркеров), затем ждёт ближайшего next_due.
+        """
+        while True:
+            with self._condition:
+                if self._stopped:
+                    return
+                # В режиме queue проверки выполняют воркеры, здесь их число не ограничено
+                limit = self.batch_size if self.mode == QUEUE_MODE else min(self.batch_size, self.max_workers - self._in_flight)
+                if limit <= 0:
+                    # Все потоки заняты — ждём завершения проверки
+                    self._condition.wait(timeout=MAX_IDLE_SECONDS)
+                    continue
+
+            try:
+                now = get_current_time(offset_hours=3)
+                batch = db.claim_due_subscriptions(now, limit=limit)
+                if batch and self.mode == QUEUE_MODE:
+                    db.enqueue_jobs([subscription.id for subscription in batch])
+                    # Время начала проверки воркером здесь неизвестно — учитываем отставание постановки в очередь
+                    for subscription in batch:
+                        observe_lag(subscription, now)
+                elif batch:
+                    with self._condition:
+                        self._in_flight += len(batch)
+                    try:
+                        self._executor.submit(self._run_batch, batch)
+                    except RuntimeError:
+                        # Пул уже остановлен (завершение процесса) — подписки проверятся после перезапуска
+                        return
+                if len(batch) == limit:
+                    continue  # Возможно, наступивших подписок больше
+                delay = self._idle_delay()
+            except Exception as e:
+                # Ошибка БД не должна останавливать мониторинг всех пользователей
+                print(f"Ошибка планировщика мониторинга: {e}")
+                delay = ERROR_BACKOFF_SECONDS
+
+            with self._condition:
+                if not self._stopped:
+                    self._condition.wait(timeout=delay)
+
+    def _idle_delay(self):
+        next_due = db.get_next_due()
+        if next_due is None:
+            return MAX_IDLE_SECONDS
+        now = get_current_time(offset_hours=3)
+        delay = (datetime.strptime(next_due, TIME_FORMAT) - datetime.strptime(now, TIME_FORMAT)).total_seconds()
+        return min(max(delay, 0), MAX_IDLE_SECONDS)
+
+    def _run_batch(self, batch):
+        """
+        Загружает App Store для всей пачки общим пакетным запросом, HTTP-сторы — одновременно
+        на асинхронном движке, и раздаёт проверки подписок в пул.
+        """
+        try:
+            prefetch_appstore_versions([sub.url for sub in batch if sub.store == "appstore"])
+        except Exception as e:
+            print(f"Ошибка пакетной загрузки App Store: {e}")
+        try:
+            prefetch_http_snapshots(batch)
+        except Exception as e:
+            print(f"Ошибка асинхронной загрузки сторов: {e}")
+
+        for index, subscription in enumerate(batch):
+            try:
+                self._executor.submit(self._run, subscription)
+            except RuntimeError:
+                self._finish(len(batch) - index)
+                break
+
+    def _run(self, subscription):
+        try:
+            # Отставание считается от исходного next_due до фактического начала проверки,
+            # включая ожидание пакетной загрузки и свободного потока
+            observe_lag(subscription, get_current_time(offset_hours=3))
+            check_subscription(subscription, self.config, self.adaptive)
+        finally:
+            self._finish(1)
+
+    def _finish(self, count):
+        """
+        Освобождает места завершённых проверок и будит цикл, чтобы он забрал следующие подписки.
+        """
+        with self._condition:
+            self._in_flight -= count
+            self._condition.notify_all()
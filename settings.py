@@ -0,0 +1,26 @@
+import json
+
+CONFIG_PATH = "config.json"
+
+_config = None
+
+
+def load_config():
+    """
+    Загружает конфигурацию из config.json (один раз за процесс).
+    """
+    global _config
+    if _config is None:
+        with open(CONFIG_PATH, "r") as file:
+            _config = json.load(file)
+    return _config
+
+
+def get_setting(key, default=None):
+    """
+    Возвращает значение параметра конфигурации или default, если параметр не задан.
+    """
+    try:
+        return load_config().get(key, default)
+    except FileNotFoundError:
+        return default
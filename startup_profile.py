@@ -0,0 +1,84 @@
+"""
+Замер времени запуска бота (флаг --profile-startup).
+
+    python new.py --profile-startup
+    python bot.py --profile-startup
+
+Процесс перезапускается с `-X importtime`, выполняет инициализацию без опроса Telegram и мониторинга
+и завершается; выводятся время инициализации, самые дорогие импорты и загруженные тяжёлые модули.
+"""
+import subprocess
+import sys
+import time
+
+# Модуль импортируется первым, поэтому отсчёт идёт почти с начала запуска скрипта
+STARTED = time.perf_counter()
+
+FLAG = "--profile-startup"
+
+# Зависимости, которые не должны загружаться до первого обращения к соответствующему стору
+HEAVY_MODULES = ["selenium", "webdriver_manager", "bs4"]
+
+
+def is_requested():
+    return FLAG in sys.argv
+
+
+def profile_imports(script, top=15):
+    """
+    Запускает script с -X importtime и печатает его отчёт и самые дорогие импорты.
+    Возвращает код завершения дочернего процесса.
+    """
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", script] + sys.argv[1:], capture_output=True, text=True
+    )
+    elapsed = time.perf_counter() - started
+
+    sys.stdout.write(result.stdout)
+    imports = parse_importtime(result.stderr)
+    if not imports:
+        sys.stderr.write(result.stderr)
+        return result.returncode
+
+    total = sum(cumulative for _, depth, _, cumulative in imports if depth == 0)
+    print(f"Импорт модулей: {total / 1e6:.3f} с, процесс целиком: {elapsed:.3f} с")
+    print("Самые дорогие импорты (с учётом вложенных):")
+    for name, _, own, cumulative in sorted(imports, key=lambda row: row[3], reverse=True)[:top]:
+        print(f"  {cumulative / 1000:9.1f} мс  (собственный {own / 1000:7.1f} мс)  {name}")
+    return result.returncode
+
+
+def parse_importtime(stderr):
+    """
+    Разбирает вывод -X importtime: список (модуль, глубина вложенности, собственное время, суммарное время в мкс).
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # Заголовок таблицы
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), depth, int(parts[0]), int(parts[1])))
+    return imports
+
+
+def report(script):
+    """
+    Печатает время инициализации script и список уже загруженных тяжёлых модулей.
+    """
+    from stores.registry import loaded_backends
+
+    elapsed = time.perf_counter() - STARTED
+    heavy = [name for name in HEAVY_MODULES if name in sys.modules]
+    backends = loaded_backends()
+
+    print(f"Инициализация {script}: {elapsed:.3f} с, модулей загружено: {len(sys.modules)}")
+    print(f"Тяжёлые зависимости: {', '.join(heavy) if heavy else 'не загружены'}")
+    print("Модули сторов: " + (
+        ", ".join(f"{store} ({seconds:.3f} с)" for store, seconds in backends.items())
+        if backends else "не загружены"
+    ))
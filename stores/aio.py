@@ -0,0 +1,255 @@
+import asyncio
+import atexit
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import aiohttp
+from metrics import observe_fetch
+from settings import get_setting
+from stores.appstore import LOOKUP_URL, extract_app_id_from_url, extract_country_from_url, parse_lookup_response
+from stores.breaker import AppNotFoundError, get_breaker
+from stores.cache import Snapshot
+from stores.conditional import NOT_FOUND_STATUSES, cache_key, conditional_cache
+from stores.coordinator import load_snapshot
+from stores.googleplay import REQUEST_HEADERS, add_language_parameter, parse_googleplay_html
+from stores.rustore import (
+    API_URL as RUSTORE_API_URL, extract_package_name_from_url, get_version_rustore_selenium, parse_rustore_data,
+)
+
+# Сколько одновременных запросов допускается к каждому хосту
+HOST_LIMITS = {
+    "itunes.apple.com": 20,
+    "play.google.com": 10,
+    "backapi.rustore.ru": 10,
+    "www.rustore.ru": 4,
+    "appgallery.huawei.com": 2,
+}
+
+
+class AsyncFetchEngine:
+    """
+    Асинхронный движок загрузки сторов на одном event loop.
+    Все HTTP-запросы идут через общую aiohttp-сессию с keep-alive, число одновременных
+    запросов к каждому хосту ограничено семафором. Запросы условные (общий conditional_cache),
+    неизменившиеся ответы повторно не разбираются. Сторы, которым нужен Selenium
+    (AppGallery и режимы selenium для остальных), выполняются в пуле потоков.
+
+    Пример:
+        async with AsyncFetchEngine() as engine:
+            snapshot = await engine.fetch("appstore", url)
+    """
+
+    def __init__(self, host_limits=None, default_limit=4, executor=None, timeout=10, connection_limit=100):
+        self.host_limits = {**HOST_LIMITS, **(host_limits or {})}
+        self.default_limit = default_limit
+        self._owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=get_setting("driver_pool_size", 2), thread_name_prefix="selenium-adapter"
+        )
+        self.timeout = timeout
+        self.connection_limit = connection_limit
+
+        self._session = None
+        self._semaphores = {}
+        self._fetchers = {
+            "appstore": self.fetch_appstore,
+            "rustore": self.fetch_rustore,
+            "googleplay": self.fetch_googleplay,
+            "appgallery": self.fetch_appgallery,
+        }
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def start(self):
+        """
+        Открывает общую HTTP-сессию.
+        """
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.connection_limit, keepalive_timeout=60, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+
+    async def close(self):
+        """
+        Закрывает HTTP-сессию и пул потоков, если он создан движком.
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._owns_executor:
+            self.executor.shutdown(wait=False)
+
+    async def fetch(self, store, url):
+        """
+        Загружает данные приложения из указанного стора и возвращает Snapshot.
+        Пока автомат защиты стора разомкнут, сразу поднимается StoreUnavailableError.
+        """
+        started = time.perf_counter()
+        try:
+            snapshot = await self._fetch_guarded(store, url)
+        except Exception as e:
+            observe_fetch(store, started, e)
+            raise
+        observe_fetch(store, started)
+        return snapshot
+
+    async def _fetch_guarded(self, store, url):
+        breaker = get_breaker(store)
+        breaker.allow()
+        try:
+            snapshot = await self._fetchers[store](url)
+        except AppNotFoundError:
+            breaker.release_probe()
+            raise
+        except Exception as e:
+            breaker.record_failure(e)
+            raise
+        except BaseException:
+            breaker.release_probe()
+            raise
+        breaker.record_success()
+        return snapshot
+
+    async def fetch_many(self, items):
+        """
+        Загружает пачку (стор, url) параллельно.
+        Возвращает список той же длины: Snapshot или исключение для каждого элемента.
+        """
+        return await asyncio.gather(*(self.fetch(store, url) for store, url in items), return_exceptions=True)
+
+    async def fetch_appstore(self, url):
+        app_id = extract_app_id_from_url(url) if url.startswith("http") else url
+        try:
+            data = await self._get(
+                LOOKUP_URL,
+                parse_lookup_response,
+                params={"id": app_id, "country": extract_country_from_url(url)},
+            )
+        except aiohttp.ClientError as e:
+            raise RuntimeError(f"Ошибка сети при обращении к App Store: {e}")
+        except ValueError as e:
+            raise RuntimeError(f"Ошибка обработки данных App Store: {e}")
+        return Snapshot(*data, time.time())
+
+    async def fetch_rustore(self, url):
+        try:
+            data = await self._get(
+                RUSTORE_API_URL.format(package_name=extract_package_name_from_url(url)),
+                lambda body: parse_rustore_data(json.loads(body)),
+            )
+            return Snapshot(*data, time.time())
+        except (aiohttp.ClientError, ValueError) as e:
+            if not get_setting("rustore_selenium_fallback", False):
+                raise RuntimeError(f"Ошибка при обращении к RuStore: {e}")
+            # API уже опрошен — сразу читаем страницу версий
+            data = await self._run_in_executor(url, get_version_rustore_selenium, url)
+            return Snapshot(*data, time.time())
+
+    async def fetch_googleplay(self, url):
+        if get_setting("googleplay_mode", "http") == "selenium":
+            return await self._run_in_executor(url, load_snapshot, "googleplay", url)
+        try:
+            data = await self._get(
+                add_language_parameter(url),
+                lambda body: parse_googleplay_html(body.decode("utf-8", errors="replace")),
+                headers=REQUEST_HEADERS,
+            )
+            return Snapshot(*data, time.time())
+        except aiohttp.ClientError as e:
+            raise RuntimeError(f"Ошибка сети при обращении к Google Play: {e}")
+        except ValueError as e:
+            raise RuntimeError(f"Ошибка при парсинге Google Play: {e}")
+
+    async def fetch_appgallery(self, url):
+        return await self._run_in_executor(url, load_snapshot, "appgallery", url)
+
+    def _semaphore(self, host):
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.host_limits.get(host, self.default_limit))
+        return self._semaphores[host]
+
+    async def _get(self, url, parse, params=None, headers=None):
+        """
+        Условный GET-запрос: возвращает parse(тело ответа в байтах) или прежний результат,
+        если стор ответил 304 или тело не изменилось. Таймаут поднимается как aiohttp.ServerTimeoutError.
+        """
+        await self.start()
+        key = cache_key(url, params)
+        request_headers = {**(headers or {}), **conditional_cache.request_headers(key)}
+        async with self._semaphore(urlparse(url).hostname):
+            try:
+                async with self._session.get(url, params=params, headers=request_headers) as response:
+                    if response.status in NOT_FOUND_STATUSES:
+                        raise AppNotFoundError(f"Приложение не найдено: {url} ответил {response.status}")
+                    if response.status != 304:
+                        response.raise_for_status()
+                    body = await response.read()
+            except asyncio.TimeoutError as e:
+                # Таймаут — такая же ошибка сети стора, как обрыв соединения
+                raise aiohttp.ServerTimeoutError(f"Нет ответа за {self.timeout} с: {url}") from e
+        return conditional_cache.resolve(key, response.status, response.headers, body, parse)
+
+    async def _run_in_executor(self, url, func, *args):
+        """
+        Адаптер для синхронных (Selenium) загрузчиков: выполняет func(*args) в пуле потоков,
+        соблюдая ограничение по хосту стора.
+        """
+        async with self._semaphore(urlparse(url).hostname):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+
+
+# Общий движок процесса: одна сессия aiohttp с keep-alive живёт между пачками на отдельном потоке event loop
+_engine = None
+_loop = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """
+    Общий движок процесса и его event loop; поток цикла запускается при первом обращении.
+    """
+    global _engine, _loop
+    with _engine_lock:
+        if _engine is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="aio-fetch-loop", daemon=True).start()
+            _engine = AsyncFetchEngine()
+            asyncio.run_coroutine_threadsafe(_engine.start(), _loop).result()
+            atexit.register(close_engine)
+        return _engine, _loop
+
+
+def close_engine():
+    """
+    Закрывает общий движок и останавливает его event loop.
+    """
+    global _engine, _loop
+    with _engine_lock:
+        engine, loop = _engine, _loop
+        _engine = _loop = None
+    if engine is None:
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(engine.close(), loop).result(timeout=engine.timeout)
+    except Exception as e:
+        print(f"Ошибка закрытия асинхронного движка: {e}")
+    loop.call_soon_threadsafe(loop.stop)
+
+
+def fetch_all(items):
+    """
+    Синхронная обёртка: загружает пачку (стор, url) на общем движке процесса.
+    Вызывается из любого потока; соединения и ограничения по хостам общие для всех пачек.
+    """
+    engine, loop = get_engine()
+    return asyncio.run_coroutine_threadsafe(engine.fetch_many(items), loop).result()
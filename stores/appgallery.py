@@ -1,11 +1,54 @@
+from bs4 import BeautifulSoup
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
+from stores.breaker import AppNotFoundError
+from stores.driver_pool import get_driver_pool
+from tracing import span
+
+# Страница отрисовывается скриптами: ждём только блок с версией, остальное читаем из того же HTML
+VERSION_XPATH = '//div[@class="appSingleInfo" and .//div[text()="Версия"]]/div[@class="info_val"]'
+
+# Тексты страницы удалённого (или недоступного в регионе) приложения
+NOT_FOUND_MARKERS = ("404", "не найден", "не существует", "недоступн", "not found", "unavailable", "does not exist")
+
+
+def parse_appgallery_html(html):
+    """
+    Разбирает отрисованную страницу AppGallery за один проход.
+    Возвращает версию, дату обновления и changelog (отсутствующие поля — None).
+    """
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Блоки appSingleInfo: подпись ("Версия", "Обновлено", ...) и значение в info_val
+    info = {}
+    for block in soup.find_all("div", class_="appSingleInfo"):
+        value = block.find("div", class_="info_val")
+        if value is None:
+            continue
+        for label in block.find_all("div", recursive=False):
+            if label is not value:
+                info[label.get_text(strip=True)] = value.get_text(strip=True)
+
+    changelog = soup.select_one("div.detailprizecard div.openAndHide div.left")
+    return (
+        info.get("Версия"),
+        info.get("Обновлено"),
+        changelog.get_text("\n", strip=True) if changelog else None,
+    )
+
+
+def is_appgallery_not_found(html):
+    """
+    Страница без карточки приложения (блоков appSingleInfo) с сообщением об отсутствии приложения.
+    Страница без карточки и без такого сообщения считается изменившейся разметкой, а не ошибкой ссылки.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    if soup.find("div", class_="appSingleInfo") is not None:
+        return False
+    text = soup.get_text(" ", strip=True).lower()
+    return any(marker in text for marker in NOT_FOUND_MARKERS)
 
 
 def get_version_appgallery(url):
@@ -13,48 +56,29 @@ def get_version_appgallery(url):
     Получение версии приложения, даты обновления и changelog из AppGallery.
     """
     try:
-        # Настройки Chrome для headless режима
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")  # Запуск в headless режиме
-        chrome_options.add_argument("--disable-gpu")  # Отключение GPU (ускоряет headless режим)
-        chrome_options.add_argument("--no-sandbox")  # Защита от сбоев в средах без интерфейса
-        chrome_options.add_argument("--disable-dev-shm-usage")  # Улучшение для ограниченных ресурсов
-
-        # Инициализация драйвера
-        driver = webdriver.Chrome(
-            service=Service(ChromeDriverManager().install()), options=chrome_options
-        )
-        driver.get(url)
-
-        # Установка времени ожидания
-        wait = WebDriverWait(driver, 10)
-
-        def get_text(xpath):
-            """
-            Вспомогательная функция для извлечения текста по XPath с ожиданием.
-            """
+        # Берём headless Chrome из общего пула
+        with get_driver_pool().lease() as driver:
+            with span("navigate", url=url):
+                driver.get(url)
+
+            # Одно ожидание вместо трёх: отсутствующий changelog больше не стоит 10 секунд
             try:
-                return wait.until(
-                    EC.presence_of_element_located((By.XPATH, xpath))
-                ).text.strip()
+                with span("wait_selector"):
+                    WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.XPATH, VERSION_XPATH)))
             except TimeoutException:
-                return None
-
-        # Определяем XPaths
-        xpaths = {
-            "version": '//div[@class="appSingleInfo" and .//div[text()="Версия"]]/div[@class="info_val"]',
-            "updated": '//div[@class="appSingleInfo" and .//div[text()="Обновлено"]]/div[@class="info_val"]',
-            "changelog": '//div[@class="detailprizecard"]//div[@class="openAndHide"]/div[@class="left"]',
-        }
+                if is_appgallery_not_found(driver.page_source):
+                    # Приложения нет — ошибка ссылки пользователя, а не сбой стора
+                    raise AppNotFoundError(f"Приложение не найдено: {url}")
+                # Нет даже версии — изменилась разметка; сообщаем об ошибке автомату защиты стора
+                raise RuntimeError("Версия не найдена на странице")
 
-        # Получаем данные
-        version_element = get_text(xpaths["version"])
-        updated_element = get_text(xpaths["updated"])
-        changelog_element = get_text(xpaths["changelog"])
+            with span("extract"):
+                html = driver.page_source
 
-        return version_element, updated_element, changelog_element
+        with span("parse", size=len(html)):
+            return parse_appgallery_html(html)
 
+    except AppNotFoundError:
+        raise
     except Exception as e:
         raise RuntimeError(f"Ошибка Selenium: {str(e)}")
-    finally:
-        driver.quit()
\ No newline at end of file
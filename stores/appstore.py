@@ -1,6 +1,15 @@
+import json
 import requests
 from datetime import datetime
 from urllib.parse import urlparse, parse_qs
+from stores.breaker import AppNotFoundError
+from stores.conditional import conditional_get
+
+# iTunes Lookup API
+LOOKUP_URL = "https://itunes.apple.com/lookup"
+
+# Сколько app_id отправлять в одном запросе к iTunes Lookup API
+BULK_CHUNK_SIZE = 100
 
 
 def extract_app_id_from_url(url):
@@ -19,6 +28,49 @@ def extract_app_id_from_url(url):
         raise ValueError(f"Ошибка извлечения app_id из URL: {e}")
 
 
+def extract_country_from_url(url, default="ru"):
+    """
+    Извлекает код страны из URL App Store.
+    Пример URL: https://apps.apple.com/ru/app/some-app-name/id6443942006
+    Возвращает: ru
+    """
+    parts = [part for part in urlparse(url).path.split("/") if part]
+    if len(parts) > 1 and parts[1] == "app" and len(parts[0]) == 2:
+        return parts[0].lower()
+    return default
+
+
+def parse_app_data(app_data):
+    """
+    Извлекает версию, changelog и дату обновления из записи ответа iTunes Lookup API.
+    """
+    version = app_data.get("version", "Версия не найдена.")
+    changelog = app_data.get("releaseNotes", "Нет описания изменений.")
+
+    # Обрабатываем дату обновления
+    last_updated_raw = app_data.get("currentVersionReleaseDate")
+    if last_updated_raw:
+        try:
+            # Преобразуем дату из ISO 8601 в формат ДД.ММ.ГГГГ
+            last_updated = datetime.fromisoformat(last_updated_raw.replace("Z", "")).strftime("%d.%m.%Y")
+        except ValueError:
+            last_updated = "Дата обновления не распознана."
+    else:
+        last_updated = "Дата обновления не найдена."
+
+    return version, changelog, last_updated
+
+
+def parse_lookup_response(body):
+    """
+    Разбирает ответ iTunes Lookup API с одним приложением.
+    """
+    results = json.loads(body).get("results", [])
+    if not results:
+        raise AppNotFoundError("Данные о приложении не найдены.")
+    return parse_app_data(results[0])
+
+
 def get_version_appstore(url, country="ru"):
     """
     Получает последнюю версию, changelog и дату обновления приложения в App Store.
@@ -34,40 +86,54 @@ def get_version_appstore(url, country="ru"):
         else:
             app_id = url  # Если передан только app_id
 
-        # Формируем URL для API
-        api_url = f"https://itunes.apple.com/lookup?id={app_id}&country={country}"
-
-        # Отправляем запрос к API
-        response = requests.get(api_url, timeout=10)  # Указываем таймаут для надёжности
-        response.raise_for_status()
-        data = response.json()
-
-        # Проверяем наличие данных
-        results = data.get("results", [])
-        if not results:
-            raise ValueError("Данные о приложении не найдены.")
-
-        # Извлекаем нужные данные
-        app_data = results[0]
-        version = app_data.get("version", "Версия не найдена.")
-        changelog = app_data.get("releaseNotes", "Нет описания изменений.")
-
-        # Обрабатываем дату обновления
-        last_updated_raw = app_data.get("currentVersionReleaseDate")
-        if last_updated_raw:
-            try:
-                # Преобразуем дату из ISO 8601 в формат ДД.ММ.ГГГГ
-                last_updated = datetime.fromisoformat(last_updated_raw.replace("Z", "")).strftime("%d.%m.%Y")
-            except ValueError:
-                last_updated = "Дата обновления не распознана."
-        else:
-            last_updated = "Дата обновления не найдена."
-
-        return version, changelog, last_updated
+        # Условный запрос к API: неизменившийся ответ повторно не разбирается
+        return conditional_get(
+            LOOKUP_URL,
+            parse_lookup_response,
+            params={"id": app_id, "country": country},
+            timeout=10,  # Указываем таймаут для надёжности
+        )
 
+    except AppNotFoundError:
+        raise
     except requests.RequestException as req_err:
         raise RuntimeError(f"Ошибка сети при обращении к App Store: {req_err}")
     except ValueError as val_err:
         raise RuntimeError(f"Ошибка обработки данных App Store: {val_err}")
     except Exception as e:
-        raise RuntimeError(f"Непредвиденная ошибка: {e}")
\ No newline at end of file
+        raise RuntimeError(f"Непредвиденная ошибка: {e}")
+
+
+def get_versions_appstore_bulk(app_ids, country="ru", chunk_size=BULK_CHUNK_SIZE):
+    """
+    Получает данные сразу о нескольких приложениях App Store: id передаются в lookup через запятую.
+
+    :param app_ids: Список app_id приложений.
+    :param country: Код страны для локализации данных (по умолчанию 'ru').
+    :param chunk_size: Сколько id отправлять в одном запросе.
+    :return: Словарь {app_id: (версия, changelog, дата обновления)}. Ненайденные приложения в него не попадают.
+    """
+    unique_ids = list(dict.fromkeys(str(app_id) for app_id in app_ids))
+    versions = {}
+
+    try:
+        for i in range(0, len(unique_ids), chunk_size):
+            chunk = unique_ids[i:i + chunk_size]
+            response = requests.get(
+                LOOKUP_URL,
+                params={"id": ",".join(chunk), "country": country},
+                timeout=10
+            )
+            response.raise_for_status()
+
+            for app_data in response.json().get("results", []):
+                app_id = str(app_data.get("trackId", ""))
+                if app_id in chunk:
+                    versions[app_id] = parse_app_data(app_data)
+
+        return versions
+
+    except requests.RequestException as req_err:
+        raise RuntimeError(f"Ошибка сети при обращении к App Store: {req_err}")
+    except ValueError as val_err:
+        raise RuntimeError(f"Ошибка обработки данных App Store: {val_err}")
\ No newline at end of file
@@ -0,0 +1,163 @@
+import threading
+import time
+from settings import get_setting
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class StoreUnavailableError(RuntimeError):
+    """
+    Стор временно не опрашивается: его автомат разомкнут после серии ошибок.
+    """
+
+
+class AppNotFoundError(RuntimeError):
+    """
+    Стор ответил, но такого приложения в нём нет (удалено, неверный id или имя пакета).
+    Это ошибка подписки, а не стора, поэтому автомат защиты её не учитывает.
+    """
+
+
+class CircuitBreaker:
+    """
+    Автомат защиты стора (closed → open → half-open).
+    После failure_threshold ошибок подряд автомат размыкается и запросы к стору сразу
+    завершаются StoreUnavailableError, не занимая потоки и браузеры. Через recovery_timeout секунд
+    пропускается одна пробная загрузка (half-open): успех замыкает автомат, ошибка снова размыкает его
+    с удвоенным временем ожидания (не больше max_recovery_timeout).
+    Учитываются только сбои самого стора (сеть, 5xx, изменившаяся разметка): AppNotFoundError
+    пробрасывается без записи ошибки.
+    """
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=60, max_recovery_timeout=900):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.max_recovery_timeout = max_recovery_timeout
+
+        self.state = CLOSED
+        self._failures = 0
+        self._current_timeout = recovery_timeout
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+        self.total_failures = 0
+        self.rejected = 0
+        self.last_error = None
+
+    def allow(self):
+        """
+        Разрешает запрос к стору или поднимает StoreUnavailableError, пока автомат разомкнут.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            retry_in = self._opened_at + self._current_timeout - time.monotonic()
+            if self.state == OPEN and retry_in <= 0:
+                self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True  # Пробная загрузка
+                return
+            self.rejected += 1
+        raise StoreUnavailableError(
+            f"{self.name} временно недоступен ({self.last_error}), повторная проверка через {max(retry_in, 0):.0f} с"
+        )
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            if self.state != CLOSED:
+                self._current_timeout = self.recovery_timeout
+                self._set_state(CLOSED)
+
+    def record_failure(self, error):
+        with self._lock:
+            self._failures += 1
+            self.total_failures += 1
+            self.last_error = error
+            if self.state == HALF_OPEN:
+                # Проба не удалась — ждём дольше
+                self._probe_in_flight = False
+                self._current_timeout = min(self._current_timeout * 2, self.max_recovery_timeout)
+                self._open()
+            elif self.state == CLOSED and self._failures >= self.failure_threshold:
+                self._open()
+
+    def call(self, func, *args):
+        """
+        Выполняет func(*args) под защитой автомата.
+        """
+        self.allow()
+        try:
+            result = func(*args)
+        except AppNotFoundError:
+            # Стор ответил — его состояние не меняется
+            self.release_probe()
+            raise
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        except BaseException:
+            self.release_probe()
+            raise
+        self.record_success()
+        return result
+
+    def release_probe(self):
+        """
+        Снимает отметку пробной загрузки, если она прервана без результата (отмена, завершение процесса).
+        """
+        with self._lock:
+            self._probe_in_flight = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self._failures,
+                "total_failures": self.total_failures,
+                "rejected": self.rejected,
+                "retry_timeout": self._current_timeout,
+                "last_error": str(self.last_error) if self.last_error else None,
+            }
+
+    def _open(self):
+        self._opened_at = time.monotonic()
+        self._set_state(OPEN)
+
+    def _set_state(self, state):
+        if state != self.state:
+            print(f"Стор {self.name}: {self.state} → {state}")
+            self.state = state
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(store):
+    """
+    Автомат защиты стора (один на процесс). Пороги задаются breaker_* в config.json.
+    """
+    with _breakers_lock:
+        if store not in _breakers:
+            _breakers[store] = CircuitBreaker(
+                store,
+                failure_threshold=get_setting("breaker_failure_threshold", 5),
+                recovery_timeout=get_setting("breaker_recovery_timeout", 60),
+                max_recovery_timeout=get_setting("breaker_max_recovery_timeout", 900),
+            )
+        return _breakers[store]
+
+
+def store_health():
+    """
+    Состояние автоматов всех сторов, к которым уже были запросы: {стор: stats()}.
+    """
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {store: breaker.stats() for store, breaker in breakers.items()}
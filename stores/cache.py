@@ -0,0 +1,150 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+import db
+
+# Данные о версии приложения в одном сторе; fetched_at — время получения (time.time())
+Snapshot = namedtuple("Snapshot", ["version", "changelog", "last_updated", "fetched_at"])
+
+# Примерные накладные расходы на одну запись кеша (кортеж, ключ, OrderedDict), байт
+ENTRY_OVERHEAD = 200
+
+# Как часто при сохранении удаляются устаревшие записи из таблицы snapshot_cache, секунд
+DB_TRIM_INTERVAL = 600
+
+
+class SnapshotCache:
+    """
+    Кеш последних данных о приложениях, общий для мониторинга и разовых проверок.
+    Ключ — (стор, канонический ключ приложения), значение — Snapshot
+    (version, changelog, last_updated, fetched_at).
+    Запись живёт ttl секунд (свой TTL для каждого стора), при превышении лимита памяти
+    вытесняются давно не использованные записи (LRU). При persist=True кеш
+    сохраняется в SQLite (таблица snapshot_cache) и переживает перезапуск; устаревшие
+    записи удаляются из таблицы при загрузке и раз в DB_TRIM_INTERVAL секунд при сохранении.
+    """
+
+    def __init__(self, ttls=None, default_ttl=60, max_bytes=16 * 1024 * 1024, persist=False):
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.persist = persist
+
+        self._entries = OrderedDict()  # (store, app_key) -> (Snapshot, размер в байтах)
+        self._size = 0
+        self._lock = threading.Lock()
+        self._trimmed_at = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.persist:
+            self._load_from_db()
+
+    def ttl(self, store):
+        return self.ttls.get(store, self.default_ttl)
+
+    def get(self, store, app_key):
+        """
+        Возвращает свежий Snapshot или None. Учитывается в счётчиках попаданий и промахов.
+        """
+        with self._lock:
+            snapshot = self._get_fresh((store, app_key))
+            if snapshot is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return snapshot
+
+    def peek(self, store, app_key):
+        """
+        То же, что get, но без учёта в счётчиках и без обновления порядка LRU.
+        """
+        with self._lock:
+            entry = self._entries.get((store, app_key))
+            if entry is None or self._is_expired(store, entry[0]):
+                return None
+            return entry[0]
+
+    def put(self, store, app_key, snapshot):
+        """
+        Сохраняет Snapshot в кеш (и в SQLite, если включено сохранение).
+        """
+        with self._lock:
+            self._store((store, app_key), snapshot)
+        if self.persist:
+            self._save_to_db(store, app_key, snapshot)
+            if time.monotonic() - self._trimmed_at >= DB_TRIM_INTERVAL:
+                self._trim_db()
+
+    def stats(self):
+        """
+        Счётчики кеша: попадания, промахи, вытеснения, число записей и занятая память.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._size,
+            }
+
+    def _is_expired(self, store, snapshot):
+        return time.time() - snapshot.fetched_at >= self.ttl(store)
+
+    def _get_fresh(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        snapshot, size = entry
+        if self._is_expired(key[0], snapshot):
+            del self._entries[key]
+            self._size -= size
+            return None
+        self._entries.move_to_end(key)
+        return snapshot
+
+    def _store(self, key, snapshot):
+        size = ENTRY_OVERHEAD + sum(len(str(value).encode()) for value in (*key, *snapshot))
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= old[1]
+        self._entries[key] = (snapshot, size)
+        self._size += size
+
+        # Вытесняем самые старые по использованию записи, пока не уложимся в лимит
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._size -= evicted_size
+            self.evictions += 1
+
+    def _load_from_db(self):
+        """
+        Прогревает кеш записями из SQLite, которые ещё не устарели (устаревшие сначала удаляются).
+        """
+        self._trim_db()
+        rows = db.load_cached_snapshots()
+
+        with self._lock:
+            for store, app_key, version, changelog, last_updated, fetched_at in rows:
+                snapshot = Snapshot(version, changelog, last_updated, fetched_at)
+                if not self._is_expired(store, snapshot):
+                    self._store((store, app_key), snapshot)
+
+    def _trim_db(self):
+        self._trimmed_at = time.monotonic()
+        try:
+            db.delete_expired_cached_snapshots(self.ttls, self.default_ttl, time.time())
+        except sqlite3.Error as e:
+            print(f"Ошибка очистки сохранённого кеша: {e}")
+
+    def _save_to_db(self, store, app_key, snapshot):
+        try:
+            db.save_cached_snapshot(store, app_key, *snapshot)
+        except sqlite3.Error as e:
+            print(f"Ошибка сохранения кеша {store}/{app_key}: {e}")
@@ -0,0 +1,155 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from urllib.parse import urlencode
+import requests
+from metrics import CONDITIONAL_RESPONSES
+from stores.breaker import AppNotFoundError
+from tracing import span
+
+# Что запоминается о последнем ответе по URL: валидаторы HTTP, хеш тела и уже разобранный результат
+Validator = namedtuple("Validator", ["etag", "last_modified", "body_hash", "size", "result", "parse_seconds"])
+
+
+class ConditionalCache:
+    """
+    Условные запросы к сторам. Для каждого URL хранятся ETag, Last-Modified и хеш тела ответа
+    вместе с результатом разбора. Следующий запрос отправляется с If-None-Match/If-Modified-Since;
+    на ответ 304 или тело с тем же хешем возвращается прежний результат без повторного разбора.
+    Счётчики показывают, сколько трафика и времени разбора это сэкономило.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # URL -> Validator
+        self._lock = threading.Lock()
+
+        self.requests = 0
+        self.not_modified = 0  # Ответы 304
+        self.unchanged = 0  # Ответы 200 с тем же телом
+        self.parsed = 0
+        self.bytes_downloaded = 0
+        self.bytes_saved = 0  # Оценка: размер тела, которое не пришлось скачать при 304
+        self.parse_seconds = 0.0
+        self.parse_seconds_saved = 0.0  # Оценка: время последнего разбора этого URL
+
+    def request_headers(self, key):
+        """
+        Заголовки условного запроса для URL (пустой словарь, если ответ ещё не запоминался).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def resolve(self, key, status, headers, body, parse):
+        """
+        Возвращает результат разбора ответа: прежний при 304 или неизменном теле, иначе parse(body).
+        body — байты тела ответа (пустые при 304).
+        """
+        with self._lock:
+            self.requests += 1
+            self.bytes_downloaded += len(body)
+            entry = self._entries.get(key)
+
+            if status == 304 and entry is not None:
+                self.not_modified += 1
+                CONDITIONAL_RESPONSES.inc(result="not_modified")
+                self.bytes_saved += entry.size
+                self.parse_seconds_saved += entry.parse_seconds
+                self._entries.move_to_end(key)
+                return entry.result
+
+            body_hash = hashlib.sha1(body).hexdigest()
+            if entry is not None and entry.body_hash == body_hash:
+                self.unchanged += 1
+                CONDITIONAL_RESPONSES.inc(result="unchanged")
+                self.parse_seconds_saved += entry.parse_seconds
+                # Сервер мог выдать новые валидаторы для того же содержимого
+                self._entries[key] = entry._replace(
+                    etag=headers.get("ETag") or entry.etag,
+                    last_modified=headers.get("Last-Modified") or entry.last_modified,
+                )
+                self._entries.move_to_end(key)
+                return entry.result
+
+        started = time.perf_counter()
+        with span("parse", size=len(body)):
+            result = parse(body)
+        parse_seconds = time.perf_counter() - started
+
+        with self._lock:
+            self.parsed += 1
+            CONDITIONAL_RESPONSES.inc(result="parsed")
+            self.parse_seconds += parse_seconds
+            self._entries[key] = Validator(
+                headers.get("ETag"), headers.get("Last-Modified"), body_hash, len(body), result, parse_seconds
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    def clear(self):
+        """
+        Забывает все запомненные ответы (счётчики сохраняются).
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Счётчики условных запросов и оценка сэкономленного трафика и времени разбора.
+        """
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "not_modified": self.not_modified,
+                "unchanged": self.unchanged,
+                "parsed": self.parsed,
+                "bytes_downloaded": self.bytes_downloaded,
+                "bytes_saved": self.bytes_saved,
+                "parse_seconds": round(self.parse_seconds, 6),
+                "parse_seconds_saved": round(self.parse_seconds_saved, 6),
+            }
+
+
+def cache_key(url, params=None):
+    """
+    Ключ кеша: URL вместе с параметрами запроса.
+    """
+    return f"{url}?{urlencode(sorted(params.items()))}" if params else url
+
+
+# Ответы, которые означают, что приложения по этому адресу нет (а не сбой стора)
+NOT_FOUND_STATUSES = (404, 410)
+
+
+# Общие для процесса кеш валидаторов и HTTP-сессия (keep-alive между запросами к одному стору)
+conditional_cache = ConditionalCache()
+_session = requests.Session()
+
+
+def conditional_get(url, parse, params=None, headers=None, timeout=10):
+    """
+    GET-запрос с If-None-Match/If-Modified-Since. Возвращает parse(тело ответа в байтах)
+    или прежний результат, если содержимое не изменилось.
+    Ответы 404 и 410 поднимаются как AppNotFoundError, остальные ошибки HTTP — как requests.HTTPError.
+    """
+    key = cache_key(url, params)
+    request_headers = {**(headers or {}), **conditional_cache.request_headers(key)}
+
+    with span("http_get", url=url) as current:
+        response = _session.get(url, params=params, headers=request_headers, timeout=timeout)
+        current.set(status=response.status_code)
+    if response.status_code in NOT_FOUND_STATUSES:
+        raise AppNotFoundError(f"Приложение не найдено: {url} ответил {response.status_code}")
+    if response.status_code != 304:
+        response.raise_for_status()
+    return conditional_cache.resolve(key, response.status_code, response.headers, response.content, parse)
@@ -0,0 +1,124 @@
+import threading
+import time
+from metrics import observe_fetch
+from stores.breaker import get_breaker
+from stores.cache import Snapshot
+from stores.keys import get_app_key
+from stores.registry import get_fetcher
+from tracing import span
+
+
+def fetch_snapshot(store, url):
+    """
+    Получает данные о приложении из стора через автомат защиты стора: пока стор недоступен,
+    запрос сразу завершается StoreUnavailableError.
+    """
+    started = time.perf_counter()
+    try:
+        with span("fetch", store=store, url=url):
+            snapshot = get_breaker(store).call(load_snapshot, store, url)
+    except Exception as e:
+        observe_fetch(store, started, e)
+        raise
+    observe_fetch(store, started)
+    return snapshot
+
+
+def load_snapshot(store, url):
+    """
+    Получает данные о приложении из стора и приводит их к Snapshot.
+    """
+    data = get_fetcher(store)(url)
+    if store == "appgallery":
+        # AppGallery возвращает (версия, дата, changelog)
+        version, last_updated, changelog = data
+    else:
+        version, changelog, last_updated = data
+    return Snapshot(version, changelog, last_updated, time.time())
+
+
+class FetchCoordinator:
+    """
+    Координатор загрузок поверх SnapshotCache: каждый уникальный (стор, ключ приложения)
+    загружается не чаще одного раза за TTL кеша, результат получают все подписчики.
+    Одновременные запросы одного приложения ждут единственную загрузку.
+    """
+
+    def __init__(self, cache, error_ttl=60):
+        self.cache = cache
+        self.error_ttl = error_ttl
+        self._errors = {}  # (store, app_key) -> (исключение, время получения)
+        self._inflight = {}  # (store, app_key) -> threading.Event текущей загрузки
+        self._lock = threading.Lock()
+
+    def fetch(self, store, url):
+        """
+        Возвращает Snapshot приложения из кеша, а при его отсутствии загружает из стора.
+        Ошибка загрузки разделяется между подписчиками в течение error_ttl секунд.
+        """
+        app_key = get_app_key(store, url)
+        key = (store, app_key)
+
+        while True:
+            snapshot = self.cache.get(store, app_key)
+            if snapshot is not None:
+                return snapshot
+
+            with self._lock:
+                error = self._recent_error(key)
+                if error is not None:
+                    raise error
+                event = self._inflight.get(key)
+                if event is None:
+                    event = self._inflight[key] = threading.Event()
+                    owner = True
+                else:
+                    owner = False
+
+            if not owner:
+                # Загрузку уже выполняет другой поток — ждём её результата
+                event.wait()
+                continue
+
+            try:
+                snapshot = fetch_snapshot(store, url)
+                self.cache.put(store, app_key, snapshot)
+                return snapshot
+            except Exception as e:
+                with self._lock:
+                    self._errors[key] = (e, time.monotonic())
+                raise
+            finally:
+                with self._lock:
+                    del self._inflight[key]
+                event.set()
+
+    def prime(self, store, app_key, snapshot):
+        """
+        Кладёт заранее полученные данные (например, из пакетного запроса App Store).
+        """
+        self.cache.put(store, app_key, snapshot)
+
+    def fail(self, store, app_key, error):
+        """
+        Запоминает ошибку загрузки, выполненной в обход fetch (например, асинхронной предзагрузкой):
+        подписчики получат её в течение error_ttl секунд без повторного запроса.
+        """
+        with self._lock:
+            self._errors[(store, app_key)] = (error, time.monotonic())
+
+    def is_fresh(self, store, app_key):
+        """
+        Проверяет, есть ли для приложения свежие данные в кеше.
+        """
+        return self.cache.peek(store, app_key) is not None
+
+    def _recent_error(self, key):
+        entry = self._errors.get(key)
+        if entry is None:
+            return None
+        error, failed_at = entry
+        if time.monotonic() - failed_at >= self.error_ttl:
+            del self._errors[key]
+            return None
+        return error
@@ -0,0 +1,249 @@
+import atexit
+import queue
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.common.exceptions import InvalidSessionIdException, WebDriverException
+from selenium.webdriver.chrome.service import Service
+from metrics import DRIVER_LEASE_WAIT_SECONDS
+from settings import get_setting
+from tracing import span
+
+
+def create_chrome_options():
+    """
+    Настройки Chrome для headless режима, общие для всех сторов.
+    """
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless")  # Запуск в headless режиме
+    options.add_argument("--disable-gpu")  # Отключение GPU (ускоряет headless режим)
+    options.add_argument("--no-sandbox")  # Защита от сбоев в средах без интерфейса
+    options.add_argument("--disable-dev-shm-usage")  # Улучшение для ограниченных ресурсов
+    return options
+
+
+_chromedriver_path = None
+_chromedriver_lock = threading.Lock()
+
+
+def get_chromedriver_path():
+    """
+    Путь к chromedriver, определяется один раз за процесс: chromedriver_path из config.json,
+    затем chromedriver из PATH, затем загрузка через webdriver-manager.
+    Возвращает None, если путь определить не удалось (тогда драйвер ищет сам Selenium).
+    """
+    global _chromedriver_path
+    with _chromedriver_lock:
+        if _chromedriver_path is None:
+            path = get_setting("chromedriver_path") or shutil.which("chromedriver")
+            if not path:
+                try:
+                    from webdriver_manager.chrome import ChromeDriverManager
+                    path = ChromeDriverManager().install()
+                except Exception as e:
+                    print(f"Не удалось определить путь к chromedriver: {e}")
+                    path = ""
+            _chromedriver_path = path
+            print(f"chromedriver: {path or 'путь определяет Selenium'}")
+        return _chromedriver_path or None
+
+
+def create_chrome_driver():
+    """
+    Запускает новый экземпляр headless Chrome.
+    """
+    driver = webdriver.Chrome(service=Service(executable_path=get_chromedriver_path()), options=create_chrome_options())
+    driver.set_page_load_timeout(30)
+    return driver
+
+
+class PooledDriver:
+    """
+    Драйвер из пула вместе с его возрастом и количеством использований.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.created_at = time.monotonic()
+        self.uses = 0
+
+
+class DriverPool:
+    """
+    Пул «прогретых» экземпляров headless Chrome.
+    Драйвер берётся в аренду через lease(), после использования сбрасывается
+    (cookies, about:blank) и возвращается в пул. Драйверы, превысившие max_uses
+    или max_age, а также упавшие (потерянная сессия, браузер не отвечает), закрываются
+    и создаются заново; после таймаутов ожидания на странице драйвер остаётся в пуле.
+    """
+
+    def __init__(self, size=2, max_uses=50, max_age=1800, lease_timeout=120, driver_factory=create_chrome_driver):
+        self.size = size
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self.lease_timeout = lease_timeout
+        self.driver_factory = driver_factory
+
+        self._idle = queue.LifoQueue()  # Последний возвращённый драйвер — самый «тёплый»
+        self._slots = threading.BoundedSemaphore(size)  # Ограничивает число одновременно живых драйверов
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._leased = set()  # Выданные драйверы: закрываются в close(), даже если их не вернули
+        self._closed = False
+
+    @contextmanager
+    def lease(self, timeout=None):
+        """
+        Выдаёт драйвер во временное пользование.
+        Пример:
+            with pool.lease() as driver:
+                driver.get(url)
+        """
+        with DRIVER_LEASE_WAIT_SECONDS.time(), span("driver_acquire") as current:
+            item = self._acquire(self.lease_timeout if timeout is None else timeout)
+            current.set(driver_uses=item.uses)
+        broken = False
+        try:
+            yield item.driver
+        except InvalidSessionIdException:
+            # Сессия браузера потеряна — драйвер не возвращаем в пул
+            broken = True
+            raise
+        except WebDriverException:
+            # Таймауты ожидания и ненайденные элементы (сбой стора или новая разметка) браузер не ломают:
+            # пересоздаём его, только если он действительно не отвечает
+            broken = not self._is_healthy(item)
+            raise
+        finally:
+            self._release(item, broken)
+
+    def stats(self):
+        """
+        Текущее состояние пула: размер, занятые и свободные драйверы.
+        """
+        with self._lock:
+            in_use = self._in_use
+        return {"size": self.size, "in_use": in_use, "idle": self._idle.qsize()}
+
+    def close(self):
+        """
+        Закрывает все драйверы пула, включая выданные: вызывается при остановке процесса
+        (после завершения проверок) и перед перезапуском, чтобы не оставлять процессы Chrome.
+        """
+        self._closed = True
+        with self._lock:
+            leased = list(self._leased)
+        for item in leased:
+            self._quit(item)
+        while True:
+            try:
+                item = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._quit(item)
+
+    def _acquire(self, timeout):
+        if self._closed:
+            raise RuntimeError("Пул драйверов закрыт")
+        if not self._slots.acquire(timeout=timeout):
+            raise RuntimeError(f"Нет свободного драйвера Chrome за {timeout} с")
+
+        try:
+            item = None
+            while item is None:
+                try:
+                    item = self._idle.get_nowait()
+                except queue.Empty:
+                    with span("driver_start"):
+                        item = PooledDriver(self.driver_factory())
+                    break
+
+                # Проверяем драйвер из пула перед выдачей
+                if self._is_expired(item) or not self._is_healthy(item):
+                    self._quit(item)
+                    item = None
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+            self._leased.add(item)
+        return item
+
+    def _release(self, item, broken):
+        item.uses += 1
+        try:
+            if broken or self._closed or self._is_expired(item) or not self._reset(item):
+                self._quit(item)
+            else:
+                self._idle.put(item)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+                self._leased.discard(item)
+            self._slots.release()
+
+    def _is_expired(self, item):
+        return item.uses >= self.max_uses or time.monotonic() - item.created_at >= self.max_age
+
+    @staticmethod
+    def _is_healthy(item):
+        """
+        Проверка «жив ли браузер»: любой вызов к упавшему драйверу бросает исключение.
+        """
+        try:
+            item.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _reset(item):
+        """
+        Сбрасывает состояние драйвера перед возвратом в пул.
+        """
+        try:
+            item.driver.delete_all_cookies()
+            item.driver.get("about:blank")
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _quit(item):
+        try:
+            item.driver.quit()
+        except Exception:
+            pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def current_pool():
+    """
+    Пул драйверов процесса, если он уже создан, иначе None (пул не создаётся).
+    """
+    return _pool
+
+
+def get_driver_pool():
+    """
+    Общий пул драйверов процесса. Параметры берутся из config.json.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            get_chromedriver_path()  # Определяем путь к драйверу один раз, до запуска первого браузера
+            _pool = DriverPool(
+                size=get_setting("driver_pool_size", 2),
+                max_uses=get_setting("driver_max_uses", 50),
+                max_age=get_setting("driver_max_age", 1800),
+            )
+            # Браузеры закрываются и при обычном завершении процесса
+            atexit.register(_pool.close)
+        return _pool
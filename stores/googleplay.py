@@ -1,12 +1,30 @@
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from datetime import datetime
+import requests
+from datetime import datetime, timezone
+from html import unescape
 from urllib.parse import urlencode, urlparse, parse_qs, urlunparse
+import json
 import locale
 import re
 import time
+from settings import get_setting
+from stores.conditional import conditional_get
+from tracing import span
+
+# Данные страницы приложения встраиваются в HTML вызовами AF_initDataCallback({key: 'ds:N', ..., data: [...]})
+AF_INIT_DATA_RE = re.compile(
+    r"AF_initDataCallback\(\{key:\s*'(ds:\d+)'.*?data:(.*?), sideChannel:\s*\{\}\}\);\s*</script",
+    re.DOTALL,
+)
+
+# Пути к полям внутри блоба с деталями приложения
+VERSION_PATH = (1, 2, 140, 0, 0, 0)
+UPDATED_PATH = (1, 2, 145, 0, 1, 0)
+WHATS_NEW_PATH = (1, 2, 144, 1, 1)
+
+REQUEST_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "Accept-Language": "ru-RU,ru;q=0.9",
+}
 
 
 def add_language_parameter(url, lang="ru"):
@@ -47,52 +65,144 @@ def format_date_googleplay(raw_date):
         return "Дата обновления не найдена"
 
 
-def get_version_googleplay(base_url):
-    driver = None
+def extract_af_init_data(html):
+    """
+    Извлекает JSON-блобы AF_initDataCallback из HTML страницы.
+    Возвращает словарь {ключ: данные}, например {"ds:5": [...]}.
+    """
+    blobs = {}
+    for key, raw_data in AF_INIT_DATA_RE.findall(html):
+        try:
+            blobs[key] = json.loads(raw_data)
+        except ValueError:
+            continue
+    return blobs
+
+
+def get_nested(data, path):
+    """
+    Безопасно достаёт значение из вложенных списков по пути индексов.
+    """
+    for index in path:
+        if not isinstance(data, list) or index >= len(data):
+            return None
+        data = data[index]
+    return data
+
+
+def html_to_text(fragment):
+    """
+    Превращает HTML-фрагмент ченджлога (<br>, сущности) в обычный текст.
+    """
+    text = re.sub(r"<br\s*/?>", "\n", fragment)
+    text = re.sub(r"<[^>]+>", "", text)
+    return unescape(text).strip()
+
+
+def parse_googleplay_html(html):
+    """
+    Разбирает статический HTML страницы Google Play.
+    Возвращает версию, ченджлог и дату обновления (ДД.ММ.ГГГГ).
+    """
+    version = whats_new = last_updated = None
+
+    for data in extract_af_init_data(html).values():
+        version = version or get_nested(data, VERSION_PATH)
+        whats_new = whats_new or get_nested(data, WHATS_NEW_PATH)
+        last_updated = last_updated or get_nested(data, UPDATED_PATH)
+
+    if version is None and last_updated is None:
+        raise ValueError("Данные о приложении не найдены в AF_initDataCallback")
+
+    if isinstance(last_updated, int):
+        last_updated = datetime.fromtimestamp(last_updated, tz=timezone.utc).strftime("%d.%m.%Y")
+    else:
+        last_updated = "Дата обновления не найдена"
+
+    version = version if isinstance(version, str) else "Версия не найдена"
+    whats_new = html_to_text(whats_new) if isinstance(whats_new, str) else "Изменения не найдены"
+
+    return version, whats_new, last_updated
+
+
+def get_version_googleplay_http(base_url):
+    """
+    Получает версию, ченджлог и дату обновления из Google Play обычным HTTP-запросом без браузера.
+    """
     try:
-        # Настройка Chrome WebDriver с headless-режимом
-        options = webdriver.ChromeOptions()
-        options.add_argument("--headless")
-        options.add_argument("--disable-gpu")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-        driver = webdriver.Chrome(options=options)
+        localized_url = add_language_parameter(base_url)
+        return conditional_get(
+            localized_url,
+            lambda body: parse_googleplay_html(body.decode("utf-8", errors="replace")),
+            headers=REQUEST_HEADERS,
+            timeout=10,
+        )
+    except requests.RequestException as req_err:
+        raise RuntimeError(f"Ошибка сети при обращении к Google Play: {req_err}")
+    except ValueError as val_err:
+        raise RuntimeError(f"Ошибка при парсинге Google Play: {val_err}")
+
+
+def get_version_googleplay(base_url):
+    """
+    Получает версию, ченджлог и дату обновления из Google Play.
+    Режим задаётся googleplay_mode в config.json: "http" (по умолчанию) или "selenium".
+    """
+    if get_setting("googleplay_mode", "http") == "selenium":
+        return get_version_googleplay_selenium(base_url)
+    return get_version_googleplay_http(base_url)
+
 
+def get_version_googleplay_selenium(base_url):
+    """
+    Получает версию, ченджлог и дату обновления из Google Play с использованием Selenium в headless режиме.
+    """
+    # Selenium импортируется только в режиме googleplay_mode = "selenium"
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from stores.driver_pool import get_driver_pool
+
+    try:
         localized_url = add_language_parameter(base_url)
-        driver.get(localized_url)
-        wait = WebDriverWait(driver, 10)
 
-        # Извлечение ченджлога
-        whats_new_block = wait.until(EC.presence_of_element_located((By.XPATH, "//div[contains(@itemprop, 'description')]")))
-        whats_new = whats_new_block.text.strip() if whats_new_block else "Изменения не найдены"
+        # Берём headless Chrome из общего пула
+        with get_driver_pool().lease() as driver:
+            with span("navigate", url=localized_url):
+                driver.get(localized_url)
+            wait = WebDriverWait(driver, 10)
 
-        # Извлечение даты обновления
-        last_updated_block = wait.until(EC.presence_of_element_located((By.XPATH, "//div[contains(@class, 'xg1aie')]")))
-        raw_last_updated = last_updated_block.text.strip() if last_updated_block else "Дата обновления не найдена"
-        last_updated = format_date_googleplay(raw_last_updated)
+            with span("wait_selector"):
+                # Извлечение ченджлога
+                whats_new_block = wait.until(EC.presence_of_element_located((By.XPATH, "//div[contains(@itemprop, 'description')]")))
+                whats_new = whats_new_block.text.strip() if whats_new_block else "Изменения не найдены"
 
-        # Клик по кнопке описания
-        try:
-            description_button = wait.until(EC.presence_of_element_located(
-                (By.XPATH, ".//button[contains(@class, 'VfPpkd-Bz112c-LgbsSe yHy1rc eT1oJ QDwDD mN1ivc VxpoF')]")))
-            driver.execute_script("arguments[0].scrollIntoView(true);", description_button)
-            driver.execute_script("arguments[0].click();", description_button)
-        except Exception:
-            pass
+                # Извлечение даты обновления
+                last_updated_block = wait.until(EC.presence_of_element_located((By.XPATH, "//div[contains(@class, 'xg1aie')]")))
+                raw_last_updated = last_updated_block.text.strip() if last_updated_block else "Дата обновления не найдена"
+                last_updated = format_date_googleplay(raw_last_updated)
 
-        time.sleep(2)
+            # Клик по кнопке описания
+            try:
+                description_button = wait.until(EC.presence_of_element_located(
+                    (By.XPATH, ".//button[contains(@class, 'VfPpkd-Bz112c-LgbsSe yHy1rc eT1oJ QDwDD mN1ivc VxpoF')]")))
+                driver.execute_script("arguments[0].scrollIntoView(true);", description_button)
+                driver.execute_script("arguments[0].click();", description_button)
+            except Exception:
+                pass
 
-        # Извлечение версии
-        try:
-            version_block = wait.until(
-                EC.presence_of_element_located((By.XPATH, "//div[contains(text(), 'Версия')]/following-sibling::div")))
-            version = version_block.text.strip() if version_block and version_block.text else "Версия не найдена"
-        except Exception:
-            version = "Версия не найдена"
+            with span("sleep", seconds=2):
+                time.sleep(2)
+
+            # Извлечение версии
+            with span("extract"):
+                try:
+                    version_block = wait.until(
+                        EC.presence_of_element_located((By.XPATH, "//div[contains(text(), 'Версия')]/following-sibling::div")))
+                    version = version_block.text.strip() if version_block and version_block.text else "Версия не найдена"
+                except Exception:
+                    version = "Версия не найдена"
 
-        driver.quit()
         return version, whats_new, last_updated
     except Exception as e:
-        if driver:
-            driver.quit()
         raise RuntimeError(f"Ошибка при парсинге Google Play: {e}")
\ No newline at end of file
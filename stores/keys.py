@@ -0,0 +1,50 @@
+import re
+from urllib.parse import urlparse, parse_qs
+from stores.appstore import extract_app_id_from_url, extract_country_from_url
+from stores.rustore import extract_package_name_from_url
+
+# Идентификаторы сторов (совпадают с префиксами колонок *_url в таблице users)
+STORES = ["appstore", "rustore", "googleplay", "appgallery"]
+
+# Отображаемые названия сторов в сообщениях бота
+STORE_TITLES = {
+    "appstore": "AppStore",
+    "rustore": "RuStore",
+    "googleplay": "GooglePlay",
+    "appgallery": "AppGallery",
+}
+
+APPGALLERY_ID_RE = re.compile(r"\b(C\d+)\b")
+
+
+def get_app_key(store, url):
+    """
+    Приводит ссылку на приложение к каноническому ключу, одинаковому для любых вариантов URL:
+    - appstore: "<страна>:<app_id>", например "ru:6443942006" (данные lookup зависят от страны);
+    - googleplay: имя пакета из параметра id, например "com.example.app";
+    - rustore: имя пакета, например "ru.sberbankmobile";
+    - appgallery: id приложения, например "C101234567".
+    """
+    url = url.strip()
+
+    if store == "appstore":
+        app_id = extract_app_id_from_url(url) if url.startswith("http") else url
+        return f"{extract_country_from_url(url)}:{app_id}"
+
+    if store == "googleplay":
+        package_name = parse_qs(urlparse(url).query).get("id", [None])[0]
+        if not package_name:
+            raise ValueError(f"Некорректный URL Google Play: {url}")
+        return package_name
+
+    if store == "rustore":
+        return extract_package_name_from_url(url)
+
+    if store == "appgallery":
+        parsed_url = urlparse(url)
+        match = APPGALLERY_ID_RE.search(f"{parsed_url.path}/{parsed_url.fragment}")
+        if not match:
+            raise ValueError(f"Некорректный URL AppGallery: {url}")
+        return match.group(1)
+
+    raise ValueError(f"Неизвестный стор: {store}")
@@ -0,0 +1,53 @@
+import importlib
+import sys
+import threading
+import time
+
+# Стор -> (модуль, функция загрузки). Модуль импортируется при первом обращении к стору,
+# поэтому Selenium и его зависимости не загружаются, пока они не понадобятся
+STORE_BACKENDS = {
+    "appstore": ("stores.appstore", "get_version_appstore"),
+    "rustore": ("stores.rustore", "get_version_rustore"),
+    "googleplay": ("stores.googleplay", "get_version_googleplay"),
+    "appgallery": ("stores.appgallery", "get_version_appgallery"),
+}
+
+_fetchers = {}
+_import_seconds = {}  # Стор -> сколько занял импорт его модуля
+_lock = threading.Lock()
+
+
+def get_fetcher(store):
+    """
+    Функция загрузки данных стора; модуль стора импортируется при первом вызове.
+    """
+    fetcher = _fetchers.get(store)
+    if fetcher is not None:
+        return fetcher
+
+    with _lock:
+        if store not in _fetchers:
+            module_name, function_name = STORE_BACKENDS[store]
+            started = time.perf_counter()
+            module = importlib.import_module(module_name)
+            _import_seconds[store] = time.perf_counter() - started
+            _fetchers[store] = getattr(module, function_name)
+        return _fetchers[store]
+
+
+def close_driver_pool():
+    """
+    Закрывает пул Chrome, если он уже создан. Модуль пула (и Selenium) ради этого не импортируется.
+    """
+    driver_pool = sys.modules.get("stores.driver_pool")
+    pool = driver_pool.current_pool() if driver_pool else None
+    if pool is not None:
+        pool.close()
+
+
+def loaded_backends():
+    """
+    Уже загруженные модули сторов: {стор: время импорта в секундах}.
+    """
+    with _lock:
+        return dict(_import_seconds)
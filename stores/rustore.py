@@ -1,62 +1,139 @@
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+import json
+import requests
+from datetime import datetime
+from urllib.parse import urlparse
+from settings import get_setting
+from stores.breaker import AppNotFoundError
+from stores.conditional import conditional_get
+from tracing import span
+
+# Публичный JSON API, из которого веб-версия RuStore получает данные о приложении
+API_URL = "https://backapi.rustore.ru/applicationData/overallInfo/{package_name}"
+
+
+def extract_package_name_from_url(url):
+    """
+    Извлекает имя пакета из URL RuStore.
+    Пример URL: https://www.rustore.ru/catalog/app/ru.sberbankmobile
+    Возвращает: ru.sberbankmobile
+    """
+    parts = [part for part in urlparse(url).path.split("/") if part]
+    if "app" in parts and parts.index("app") + 1 < len(parts):
+        return parts[parts.index("app") + 1]
+    raise ValueError(f"Некорректный URL RuStore: {url}")
+
+
+def parse_rustore_data(data):
+    """
+    Разбирает ответ JSON API RuStore. Возвращает версию, changelog и дату обновления (ДД.ММ.ГГГГ).
+    """
+    if data.get("code") != "OK" or not data.get("body"):
+        raise AppNotFoundError(f"Данные о приложении не найдены: {data.get('message', data.get('code'))}")
+    app_data = data["body"]
+
+    version = app_data.get("versionName") or "Версия не найдена"
+    changelog = (app_data.get("whatsNew") or "").strip() or "Changelog не найден"
+
+    # Обрабатываем дату обновления (ISO 8601 -> ДД.ММ.ГГГГ, как в App Store)
+    last_updated_raw = app_data.get("appVerUpdatedAt")
+    if last_updated_raw:
+        try:
+            last_updated = datetime.fromisoformat(last_updated_raw.replace("Z", "")).strftime("%d.%m.%Y")
+        except ValueError:
+            last_updated = "Дата обновления не распознана."
+    else:
+        last_updated = "Дата обновления не найдена"
+
+    return version, changelog, last_updated
+
+
+def get_version_rustore_api(base_url):
+    """
+    Получает последнюю версию приложения, changelog и дату обновления из JSON API RuStore без браузера.
+    """
+    try:
+        package_name = extract_package_name_from_url(base_url)
+
+        return conditional_get(
+            API_URL.format(package_name=package_name),
+            lambda body: parse_rustore_data(json.loads(body)),
+            timeout=10,
+        )
+
+    except requests.RequestException as req_err:
+        raise RuntimeError(f"Ошибка сети при обращении к RuStore: {req_err}")
+    except ValueError as val_err:
+        raise RuntimeError(f"Ошибка обработки данных RuStore: {val_err}")
 
 
 def get_version_rustore(base_url):
+    """
+    Получает последнюю версию приложения, changelog и дату обновления из RuStore.
+    Основной путь — JSON API; если он недоступен и в config.json включён
+    rustore_selenium_fallback, страница версий читается через Selenium.
+    """
+    try:
+        return get_version_rustore_api(base_url)
+    except AppNotFoundError:
+        raise  # API ответил, что приложения нет, — страница версий его тоже не покажет
+    except RuntimeError as e:
+        if not get_setting("rustore_selenium_fallback", False):
+            raise
+        print(f"RuStore API недоступен ({e}), используем Selenium")
+        return get_version_rustore_selenium(base_url)
+
+
+def get_version_rustore_selenium(base_url):
     """
     Получает последнюю версию приложения, changelog и дату обновления из RuStore с использованием Selenium в headless режиме.
     """
-    driver = None
+    # Selenium импортируется только при использовании запасного пути
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from stores.driver_pool import get_driver_pool
+
     try:
         # Добавляем путь `/versions` к URL
         versions_url = f"{base_url}/versions"
 
-        # Настраиваем headless режим
-        options = webdriver.ChromeOptions()
-        options.add_argument("--headless")
-        options.add_argument("--disable-gpu")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
+        # Берём headless Chrome из общего пула
+        with get_driver_pool().lease() as driver:
+            with span("navigate", url=versions_url):
+                driver.get(versions_url)
 
-        # Инициализация Selenium WebDriver
-        driver = webdriver.Chrome(options=options)
-        driver.get(versions_url)
+            # Используем WebDriverWait вместо time.sleep
+            wait = WebDriverWait(driver, 10)
 
-        # Используем WebDriverWait вместо time.sleep
-        wait = WebDriverWait(driver, 10)
+            # Ждём загрузки первого блока с версией
+            with span("wait_selector"):
+                latest_version_block = wait.until(EC.presence_of_element_located((By.XPATH, "//ul[contains(@class, 'zzIZRzwc')]/li[1]")))
 
-        # Ждём загрузки первого блока с версией
-        latest_version_block = wait.until(EC.presence_of_element_located((By.XPATH, "//ul[contains(@class, 'zzIZRzwc')]/li[1]")))
+            with span("extract"):
+                # Извлекаем версию
+                try:
+                    version_element = latest_version_block.find_element(By.XPATH, ".//p[contains(@class, 'c0TuZspB')]")
+                    version = version_element.text.strip()
+                    # Убираем лишний текст, если начинается с "Версия:"
+                    if version.lower().startswith("версия:"):
+                        version = version.split(":", 1)[-1].strip()
+                except Exception:
+                    version = "Версия не найдена"
 
-        # Извлекаем версию
-        try:
-            version_element = latest_version_block.find_element(By.XPATH, ".//p[contains(@class, 'c0TuZspB')]")
-            version = version_element.text.strip()
-            # Убираем лишний текст, если начинается с "Версия:"
-            if version.lower().startswith("версия:"):
-                version = version.split(":", 1)[-1].strip()
-        except Exception:
-            version = "Версия не найдена"
-
-        # Извлекаем changelog
-        try:
-            changelog_elements = latest_version_block.find_elements(By.XPATH, ".//p[contains(@class, 'fHq7weSI')]")
-            changelog = "\n".join([elem.text.strip() for elem in changelog_elements]) if changelog_elements else "Changelog не найден"
-        except Exception:
-            changelog = "Changelog не найден"
+                # Извлекаем changelog
+                try:
+                    changelog_elements = latest_version_block.find_elements(By.XPATH, ".//p[contains(@class, 'fHq7weSI')]")
+                    changelog = "\n".join([elem.text.strip() for elem in changelog_elements]) if changelog_elements else "Changelog не найден"
+                except Exception:
+                    changelog = "Changelog не найден"
 
-        # Извлекаем дату обновления
-        try:
-            last_updated_raw = latest_version_block.find_element(By.XPATH, ".//p[contains(@class, 'e_S0KJFo')]")
-            last_updated = last_updated_raw.text.strip().replace("Дата: ", "").strip() if last_updated_raw else "Дата обновления не найдена"
-        except Exception:
-            last_updated = "Дата обновления не найдена"
+                # Извлекаем дату обновления
+                try:
+                    last_updated_raw = latest_version_block.find_element(By.XPATH, ".//p[contains(@class, 'e_S0KJFo')]")
+                    last_updated = last_updated_raw.text.strip().replace("Дата: ", "").strip() if last_updated_raw else "Дата обновления не найдена"
+                except Exception:
+                    last_updated = "Дата обновления не найдена"
 
-        driver.quit()
         return version, changelog, last_updated
     except Exception as e:
-        if driver:
-            driver.quit()
         raise RuntimeError(f"Ошибка при парсинге RuStore: {e}")
\ No newline at end of file
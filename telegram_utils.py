@@ -1,36 +1,304 @@
-import sqlite3
+import random
+import threading
+import time
 import requests
+import db
+from metrics import TELEGRAM_MESSAGES, TELEGRAM_RATE_LIMITED, TELEGRAM_SEND_SECONDS
+from settings import get_setting
+from tracing import span
 
+# Ограничения Telegram Bot API: около 30 сообщений в секунду всего,
+# одно сообщение в секунду в личный чат и 20 сообщений в минуту в группу
+GLOBAL_RATE = 30
+PRIVATE_CHAT_RATE = 1
+GROUP_CHAT_RATE = 20 / 60
 
-def send_telegram_notification(bot_token, chat_id, message):
+# Повторные попытки при сетевых ошибках и ответах 5xx: экспоненциальная задержка с ограничением
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = 2
+BACKOFF_MAX = 300
+
+REQUEST_TIMEOUT = 10
+
+# Как часто очередь проверяет outbox, когда ждать нечего: сообщения могут добавлять
+# другие процессы (воркеры мониторинга), которые не могут разбудить её напрямую
+OUTBOX_POLL_SECONDS = 5
+
+# Пауза после ошибки БД в цикле отправки (например, «database is locked»)
+ERROR_BACKOFF_SECONDS = 5
+
+
+class TokenBucket:
+    """
+    Ведро токенов: rate токенов в секунду, не больше capacity накопленных.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """
+        Забирает токен. Возвращает 0, если токен получен, иначе — сколько секунд ждать следующего.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """
+        Ждёт и забирает токен.
+        """
+        while True:
+            delay = self.try_acquire()
+            if not delay:
+                return
+            time.sleep(delay)
+
+    def is_full(self):
+        with self._lock:
+            return self._tokens + (time.monotonic() - self._updated) * self.rate >= self.capacity
+
+
+class SendQueue:
     """
-    Отправляет уведомление пользователю через Telegram.
+    Очередь исходящих сообщений Telegram.
+    Сообщения сохраняются в таблицу outbox и отправляются одним фоновым потоком через общую
+    HTTP-сессию с учётом ограничений Telegram (общее и на каждый чат). На ответ 429 отправка
+    приостанавливается на retry_after секунд, сетевые ошибки и 5xx повторяются с нарастающей задержкой.
+    Неотправленные сообщения остаются в БД и отправляются после перезапуска.
     """
-    import requests
 
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-    payload = {
-        "chat_id": chat_id,
-        "text": message,
-        "parse_mode": "HTML"
-    }
-    try:
-        response = requests.post(url, json=payload)
-        response.raise_for_status()  # Проверяем статус ответа
-    except requests.exceptions.HTTPError as e:
+    def __init__(self, bot_token, global_rate=GLOBAL_RATE, max_attempts=MAX_ATTEMPTS, batch_size=50):
+        self.url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+        self.max_attempts = max_attempts
+        self.batch_size = batch_size
+
+        self._session = requests.Session()
+        self._global_bucket = TokenBucket(global_rate, capacity=global_rate)
+        self._chat_buckets = {}  # chat_id -> TokenBucket
+        self._deferred = {}  # chat_id -> время, до которого отложены сообщения чата в текущей пачке
+        self._paused_until = 0  # time.monotonic(), до которого Telegram просил не отправлять (retry_after)
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+        self.sent = 0
+        self.retried = 0
+        self.dropped = 0
+
+    def start(self):
+        """
+        Запускает поток отправки (повторный вызов ничего не делает).
+        """
+        with self._condition:
+            if self._thread is None:
+                self._stopped = False
+                self._thread = threading.Thread(target=self._loop, name="telegram-send-queue", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def enqueue(self, messages, parse_mode="HTML"):
+        """
+        Ставит в очередь список сообщений (chat_id, text).
+        """
+        db.enqueue_messages(messages, parse_mode)
+        TELEGRAM_MESSAGES.inc(len(messages), result="enqueued")
+        self.wake()
+
+    def wake(self):
+        """
+        Будит поток отправки (например, после записи сообщений в outbox в чужой транзакции).
+        """
+        with self._condition:
+            self._condition.notify_all()
+
+    def stats(self):
+        return {
+            "pending": db.count_outbox_messages(),
+            "sent": self.sent,
+            "retried": self.retried,
+            "dropped": self.dropped,
+        }
+
+    def _loop(self):
+        while True:
+            with self._condition:
+                if self._stopped:
+                    return
+
+            try:
+                batch = db.claim_outbox_messages(time.time(), limit=self.batch_size)
+                self._deferred = {}
+                for message in batch:
+                    with self._condition:
+                        if self._stopped:
+                            return  # Оставшиеся сообщения вернутся в очередь по истечении аренды
+                    if message.chat_id in self._deferred:
+                        # Более раннее сообщение чата отложено — это отправляем после него
+                        self._defer(message, self._deferred[message.chat_id], message.attempts)
+                        continue
+                    self._process(message)
+                delay = None if batch else self._idle_delay()
+            except Exception as e:
+                # Ошибка БД не должна останавливать отправку уведомлений;
+                # неотправленные сообщения вернутся в очередь по истечении аренды
+                print(f"Ошибка очереди отправки Telegram: {e}")
+                delay = ERROR_BACKOFF_SECONDS
+
+            if delay is not None:
+                with self._condition:
+                    if not self._stopped:
+                        self._condition.wait(timeout=delay)
+
+    def _idle_delay(self):
+        next_attempt = db.get_next_outbox_attempt()
+        if next_attempt is None:
+            return OUTBOX_POLL_SECONDS
+        return min(max(next_attempt - time.time(), 0.05), OUTBOX_POLL_SECONDS)
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) > 10000:
+                # Забываем чаты, которые давно ничего не получали
+                self._chat_buckets = {key: value for key, value in self._chat_buckets.items() if not value.is_full()}
+            # Отрицательный chat_id — группа или канал
+            bucket = self._chat_buckets[chat_id] = TokenBucket(GROUP_CHAT_RATE if chat_id < 0 else PRIVATE_CHAT_RATE)
+        return bucket
+
+    def _process(self, message):
+        # Пока чат исчерпал лимит, откладываем только его сообщение, не задерживая остальные чаты
+        delay = self._chat_bucket(message.chat_id).try_acquire()
+        if delay:
+            self._defer(message, time.time() + delay, message.attempts)
+            return
+
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            time.sleep(pause)
+        self._global_bucket.acquire()
+
+        try:
+            with TELEGRAM_SEND_SECONDS.time(), span("telegram_send", chat_id=message.chat_id) as current:
+                response = self._session.post(
+                    self.url,
+                    json={"chat_id": message.chat_id, "text": message.text, "parse_mode": message.parse_mode},
+                    timeout=REQUEST_TIMEOUT,
+                )
+                current.set(status=response.status_code)
+        except requests.exceptions.RequestException as e:
+            self._retry(message, f"ошибка сети: {e}")
+            return
+
+        if response.status_code == 200:
+            db.delete_outbox_message(message.id)
+            self.sent += 1
+            TELEGRAM_MESSAGES.inc(result="sent")
+            return
+
+        if response.status_code == 429:
+            retry_after = self._retry_after(response)
+            print(f"Telegram ограничил отправку, пауза {retry_after} с")
+            TELEGRAM_RATE_LIMITED.inc()
+            self._paused_until = time.monotonic() + retry_after
+            # Попытка не засчитывается: сообщение не было отклонено
+            self._defer(message, time.time() + retry_after, message.attempts)
+            self.retried += 1
+            TELEGRAM_MESSAGES.inc(result="retried")
+            return
+
+        if response.status_code >= 500:
+            self._retry(message, f"HTTP {response.status_code}")
+            return
+
+        # Остальные ошибки (4xx) повторять бесполезно
+        db.delete_outbox_message(message.id)
+        self.dropped += 1
+        TELEGRAM_MESSAGES.inc(result="dropped")
+        print(f"Ошибка отправки: HTTP {response.status_code} {response.text}")
         if response.status_code == 403 and "Forbidden: the group chat was deleted" in response.text:
-            print(f"Ошибка отправки: {e}, пользователь {chat_id} недоступен.")
-            remove_invalid_user(chat_id)
-        else:
-            print(f"Ошибка отправки: {e}")
+            print(f"Пользователь {message.chat_id} недоступен.")
+            remove_invalid_user(message.chat_id)
+
+    def _retry(self, message, reason):
+        attempts = message.attempts + 1
+        if attempts >= self.max_attempts:
+            db.delete_outbox_message(message.id)
+            self.dropped += 1
+            TELEGRAM_MESSAGES.inc(result="dropped")
+            print(f"Сообщение для {message.chat_id} не отправлено после {attempts} попыток ({reason})")
+            return
+        delay = min(BACKOFF_BASE ** attempts, BACKOFF_MAX) * random.uniform(0.5, 1.5)
+        self._defer(message, time.time() + delay, attempts)
+        self.retried += 1
+        TELEGRAM_MESSAGES.inc(result="retried")
+        print(f"Ошибка отправки для {message.chat_id} ({reason}), повтор через {delay:.0f} с")
+
+    def _defer(self, message, next_attempt, attempts):
+        db.reschedule_outbox_message(message, next_attempt, attempts)
+        self._deferred[message.chat_id] = next_attempt
+
+    @staticmethod
+    def _retry_after(response):
+        try:
+            return response.json()["parameters"]["retry_after"]
+        except (ValueError, KeyError, TypeError):
+            return int(response.headers.get("Retry-After", 1))
+
+
+_send_queue = None
+_send_queue_lock = threading.Lock()
+
+
+def get_send_queue(bot_token):
+    """
+    Общая очередь отправки процесса; поток отправки запускается при первом обращении.
+    """
+    global _send_queue
+    with _send_queue_lock:
+        if _send_queue is None:
+            _send_queue = SendQueue(bot_token, global_rate=get_setting("telegram_rate_limit", GLOBAL_RATE)).start()
+        return _send_queue
+
+
+def wake_send_queue():
+    """
+    Будит очередь отправки процесса, если она запущена. В процессе без очереди (bot.py: планировщик
+    или воркер мониторинга) сообщения остаются в outbox и их отправит процесс бота.
+    """
+    with _send_queue_lock:
+        send_queue = _send_queue
+    if send_queue is not None:
+        send_queue.wake()
+
+
+def send_telegram_notification(bot_token, chat_id, message):
+    """
+    Ставит уведомление пользователю в очередь отправки Telegram.
+    """
+    get_send_queue(bot_token).enqueue([(chat_id, message)])
+
 
 def remove_invalid_user(chat_id):
     """
     Удаляет пользователя с недействительным chat_id из базы данных.
     """
-    conn = sqlite3.connect("store_snap.db")
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM users WHERE user_id = ?", (chat_id,))
-    conn.commit()
-    conn.close()
-    print(f"Пользователь {chat_id} удален из базы данных.")
\ No newline at end of file
+    db.delete_user(chat_id)
+    print(f"Пользователь {chat_id} удален из базы данных.")
@@ -0,0 +1,24 @@
+import unittest
+from stores.appgallery import is_appgallery_not_found, parse_appgallery_html
+
+APP_PAGE = """
+<div class="appSingleInfo"><div>Версия</div><div class="info_val">3.4.1</div></div>
+<div class="appSingleInfo"><div>Обновлено</div><div class="info_val">12.09.2024</div></div>
+"""
+
+
+class AppGalleryNotFoundTest(unittest.TestCase):
+    def test_app_page(self):
+        self.assertFalse(is_appgallery_not_found(APP_PAGE))
+        self.assertEqual(parse_appgallery_html(APP_PAGE)[:2], ("3.4.1", "12.09.2024"))
+
+    def test_missing_app(self):
+        self.assertTrue(is_appgallery_not_found("<html><body><p>Приложение не найдено</p></body></html>"))
+
+    def test_changed_markup(self):
+        # Без карточки и без сообщения об отсутствии — это сбой разметки, а не удалённое приложение
+        self.assertFalse(is_appgallery_not_found("<html><body><div class='app'>3.4.1</div></body></html>"))
+
+
+if __name__ == "__main__":
+    unittest.main()
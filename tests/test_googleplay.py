@@ -0,0 +1,30 @@
+import os
+import unittest
+from stores.googleplay import parse_googleplay_html
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as file:
+        return file.read()
+
+
+class ParseGooglePlayHtmlTest(unittest.TestCase):
+    def test_details_page(self):
+        version, whats_new, last_updated = parse_googleplay_html(read_fixture("googleplay_details_ru.html"))
+
+        self.assertEqual(version, "7.12.0")
+        self.assertEqual(last_updated, "01.10.2024")
+        self.assertEqual(
+            whats_new,
+            '• Оплата по QR-коду в офлайн-магазинах\n• Исправлены ошибки "Мои карты"\n\nСпасибо, что пользуетесь приложением!',
+        )
+
+    def test_page_without_details(self):
+        with self.assertRaises(ValueError):
+            parse_googleplay_html("<html><body>Приложение не найдено</body></html>")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+import db
+
+# Схема users до миграций (db_setup.py исходной версии)
+BASELINE_USERS = """
+CREATE TABLE users (
+    user_id INTEGER PRIMARY KEY,
+    full_name TEXT,
+    appstore_url TEXT,
+    rustore_url TEXT,
+    googleplay_url TEXT,
+    appgallery_url TEXT,
+    interval INTEGER DEFAULT 10,
+    last_monitoring TEXT,
+    next_monitoring TEXT
+)
+"""
+
+# Уведомлённые версии пользователей до таблицы subscriptions
+BASELINE_USER_VERSIONS = """
+CREATE TABLE user_versions (
+    user_id INTEGER NOT NULL,
+    store TEXT NOT NULL,
+    app_key TEXT NOT NULL,
+    version TEXT,
+    PRIMARY KEY (user_id, store)
+)
+"""
+
+
+class MigrationTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "store_snap.db")
+        patcher = mock.patch.object(db, "DB_PATH", self.path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(db.close_connection)
+        db.close_connection()
+
+    def create_legacy_db(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute(BASELINE_USERS)
+        conn.execute(BASELINE_USER_VERSIONS)
+        conn.executemany(
+            "INSERT INTO users VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (1, "Анна", "https://apps.apple.com/ru/app/example/id6443942006",
+                 "https://www.rustore.ru/catalog/app/ru.example.wallet",
+                 "https://play.google.com/store/apps/details?id=ru.example.wallet", None,
+                 15, "2024-10-01 12:00:00", "2024-10-01 12:15:00"),
+                (2, "Борис", None, None, None,
+                 "https://appgallery.huawei.com/app/C101234567", 30, None, None),
+                (3, "Без приложений", None, None, None, None, 10, None, None),
+            ],
+        )
+        conn.executemany(
+            "INSERT INTO user_versions VALUES (?, ?, ?, ?)",
+            [
+                (1, "appstore", "ru:6443942006", "3.4.0"),
+                (1, "rustore", "ru.example.wallet", "7.11.2"),
+                (2, "appgallery", "C101234567", "12.0.1.300"),
+            ],
+        )
+        conn.commit()
+        conn.close()
+
+    def test_legacy_users_become_subscriptions(self):
+        self.create_legacy_db()
+
+        self.assertEqual(db.migrate(), len(db.MIGRATIONS))
+        self.assertEqual(db.get_schema_version(), len(db.MIGRATIONS))
+
+        rows = db.get_connection().execute(
+            "SELECT user_id, store, app_key, url, interval, next_due, notified_version "
+            "FROM subscriptions ORDER BY user_id, store"
+        ).fetchall()
+        self.assertEqual(rows, [
+            (1, "appstore", "ru:6443942006", "https://apps.apple.com/ru/app/example/id6443942006",
+             15, "2024-10-01 12:15:00", "3.4.0"),
+            (1, "googleplay", "ru.example.wallet", "https://play.google.com/store/apps/details?id=ru.example.wallet",
+             15, "2024-10-01 12:15:00", None),
+            (1, "rustore", "ru.example.wallet", "https://www.rustore.ru/catalog/app/ru.example.wallet",
+             15, "2024-10-01 12:15:00", "7.11.2"),
+            (2, "appgallery", "C101234567", "https://appgallery.huawei.com/app/C101234567",
+             30, None, "12.0.1.300"),
+        ])
+
+        # Пользователи сохраняются без колонок ссылок, user_versions удаляется
+        self.assertEqual(db.get_user(1), db.User(1, "Анна", 15, "2024-10-01 12:00:00", None))
+        self.assertEqual(db.get_user(3), db.User(3, "Без приложений", 10, None, None))
+        tables = {name for (name,) in db.get_connection().execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.assertNotIn("user_versions", tables)
+
+    def test_migrate_skips_migrations_applied_by_another_process(self):
+        db.migrate()
+
+        # Версия, прочитанная до блокировки, устарела: другой процесс уже применил все миграции
+        real_version = db.get_schema_version
+        reads = []
+
+        def stale_version():
+            reads.append(1)
+            return 1 if len(reads) == 1 else real_version()
+
+        with mock.patch.object(db, "get_schema_version", stale_version):
+            self.assertEqual(db.migrate(), len(db.MIGRATIONS))
+        self.assertEqual(real_version(), len(db.MIGRATIONS))
+
+
+if __name__ == "__main__":
+    unittest.main()
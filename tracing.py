@@ -0,0 +1,251 @@
+"""
+Трассировка проверок: вложенные участки (spans) с длительностью и атрибутами в JSONL-файле.
+
+    with span("check", store="googleplay", app_key=app_key, user_id=user_id):
+        with span("navigate", url=url):
+            driver.get(url)
+
+Решение о записи принимается для корневого участка с вероятностью trace_sample_rate и наследуется
+вложенными. Файл trace_path ротируется при достижении trace_max_mb (хранится trace_backups старых файлов).
+
+Сводка самых медленных участков по сторам:
+
+    python tracing.py traces.jsonl --top 10
+    python tracing.py traces.jsonl --store googleplay --span navigate
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+_local = threading.local()
+_logger = None
+_logger_lock = threading.Lock()
+
+
+class Span:
+    """
+    Участок трассы. Атрибуты можно дополнить по ходу выполнения через set().
+    """
+
+    def __init__(self, name, trace_id, parent_id, attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_record(self, error=None):
+        record = {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": round(self.started_at, 6),
+            "duration_ms": round((time.perf_counter() - self._started) * 1000, 3),
+            "attributes": self.attributes,
+        }
+        if error is not None:
+            record["error"] = f"{type(error).__name__}: {error}"
+        return record
+
+
+class _NoopSpan:
+    """
+    Участок трассы, которая не попала в выборку: ничего не замеряет и не пишет.
+    """
+
+    def set(self, **attributes):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def _get_logger():
+    """
+    Логгер с ротацией файла трасс или None, если трассировка выключена (trace_path пуст или trace_sample_rate = 0).
+    """
+    global _logger
+    if _logger is not None:
+        return _logger or None
+
+    from settings import get_setting
+
+    with _logger_lock:
+        if _logger is None:
+            path = get_setting("trace_path", "")
+            if not path or not get_setting("trace_sample_rate", 0):
+                _logger = False
+            else:
+                handler = RotatingFileHandler(
+                    path,
+                    maxBytes=int(get_setting("trace_max_mb", 10) * 1024 * 1024),
+                    backupCount=get_setting("trace_backups", 3),
+                    encoding="utf-8",
+                )
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger = logging.getLogger("storesnap.trace")
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                logger.addHandler(handler)
+                _logger = logger
+    return _logger or None
+
+
+def _is_sampled():
+    from settings import get_setting
+
+    return random.random() < get_setting("trace_sample_rate", 0)
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Замеряет блок with как участок текущей трассы (или начинает новую трассу).
+    Исключение из блока записывается в поле error участка и пробрасывается дальше.
+    """
+    parent = getattr(_local, "span", None)
+    if parent is None:
+        # Корневой участок: решаем, попадёт ли трасса в выборку
+        logger = _get_logger()
+        if logger is None or not _is_sampled():
+            _local.span = _NOOP
+            try:
+                yield _NOOP
+            finally:
+                _local.span = None
+            return
+        current = Span(name, uuid.uuid4().hex, None, attributes)
+    elif parent is _NOOP:
+        yield _NOOP
+        return
+    else:
+        logger = _get_logger()
+        current = Span(name, parent.trace_id, parent.span_id, attributes)
+
+    _local.span = current
+    error = None
+    try:
+        yield current
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _local.span = parent
+        try:
+            logger.info(json.dumps(current.to_record(error), ensure_ascii=False, default=str))
+        except Exception as e:
+            print(f"Ошибка записи трассы: {e}")
+
+
+# --- Сводка по файлу трасс ---
+
+def read_spans(path):
+    """
+    Читает участки из файла трасс и его ротированных копий (path.1, path.2, ...).
+    """
+    spans = []
+    for filename in [path] + sorted(glob.glob(f"{glob.escape(path)}.*")):
+        if not os.path.isfile(filename):
+            continue
+        with open(filename, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    spans.append(json.loads(line))
+                except ValueError:
+                    continue  # Строка, оборванная при аварийном завершении
+    return spans
+
+
+def resolve_store(record, by_id):
+    """
+    Стор участка: из его атрибутов или ближайшего родителя в той же трассе.
+    """
+    while record is not None:
+        store = record.get("attributes", {}).get("store")
+        if store:
+            return store
+        record = by_id.get((record["trace_id"], record.get("parent_id")))
+    return "—"
+
+
+def summarize(spans, top=10, store=None, span_name=None):
+    """
+    Возвращает строки отчёта: для каждого стора — статистика по именам участков и самые медленные участки.
+    """
+    by_id = {(record["trace_id"], record["span_id"]): record for record in spans}
+    by_store = {}
+    for record in spans:
+        if span_name and record["name"] != span_name:
+            continue
+        record_store = resolve_store(record, by_id)
+        if store and record_store != store:
+            continue
+        by_store.setdefault(record_store, []).append(record)
+
+    lines = []
+    for record_store, records in sorted(by_store.items()):
+        lines.append(f"=== {record_store}: участков {len(records)} ===")
+
+        durations = {}
+        for record in records:
+            durations.setdefault(record["name"], []).append(record["duration_ms"])
+        for name, values in sorted(durations.items(), key=lambda item: -max(item[1])):
+            values.sort()
+            p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+            lines.append(
+                f"  {name:<16} n={len(values):<6} p50={statistics.median(values):9.1f} мс "
+                f"p95={p95:9.1f} мс  max={values[-1]:9.1f} мс"
+            )
+
+        lines.append("  Самые медленные:")
+        for record in sorted(records, key=lambda item: item["duration_ms"], reverse=True)[:top]:
+            attributes = ", ".join(f"{key}={value}" for key, value in record.get("attributes", {}).items())
+            error = f"  ошибка: {record['error']}" if record.get("error") else ""
+            lines.append(
+                f"  {record['duration_ms']:9.1f} мс  {record['name']:<16} trace={record['trace_id'][:8]}  {attributes}{error}"
+            )
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сводка самых медленных участков проверок по сторам")
+    parser.add_argument("path", nargs="?", help="файл трасс (по умолчанию trace_path из config.json)")
+    parser.add_argument("--top", type=int, default=10, help="сколько самых медленных участков показать")
+    parser.add_argument("--store", help="только этот стор")
+    parser.add_argument("--span", help="только участки с этим именем (navigate, wait_selector, ...)")
+    args = parser.parse_args(argv)
+
+    path = args.path
+    if not path:
+        from settings import get_setting
+        path = get_setting("trace_path", "")
+    if not path:
+        parser.error("не указан файл трасс")
+
+    spans = read_spans(path)
+    if not spans:
+        print(f"В {path} нет участков")
+        return 1
+    for line in summarize(spans, args.top, args.store, args.span):
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,253 @@
+"""
+Режим вебхука для интерфейса бота (webhook_enabled в config.json).
+
+Локальный HTTP-сервер принимает обновления Telegram, сразу отвечает 200 и передаёт их в ограниченный
+пул обработчиков: обновления одного чата обрабатываются строго по очереди, разные чаты — параллельно
+(не больше webhook_max_concurrency одновременно). Если в очереди больше webhook_max_pending обновлений,
+сервер отвечает 503, и Telegram повторит доставку позже.
+
+Проверка без Telegram — отправить записанные обновления (по одному JSON на строку) на локальный сервер:
+
+    python webhook.py updates.jsonl --url http://127.0.0.1:8443/telegram
+"""
+import argparse
+import asyncio
+import json
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.request import Request, urlopen
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def get_chat_key(update):
+    """
+    Ключ упорядочивания обновления: id чата (или отправителя), иначе update_id — такое обновление
+    ни с чем не упорядочивается.
+    """
+    for key, payload in update.items():
+        if key == "update_id" or not isinstance(payload, dict):
+            continue
+        chat = payload.get("chat") or (payload.get("message") or {}).get("chat")
+        if chat and "id" in chat:
+            return chat["id"]
+        sender = payload.get("from") or payload.get("user")
+        if sender and "id" in sender:
+            return sender["id"]
+    return ("update", update.get("update_id"))
+
+
+class UpdateDispatcher:
+    """
+    Пул обработчиков обновлений с порядком внутри чата: у каждого чата своя очередь,
+    и в пуле одновременно выполняется не больше одной задачи этого чата.
+    """
+
+    def __init__(self, handle, max_concurrency=16, max_pending=1000):
+        self.handle = handle
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="webhook")
+        self._queues = {}  # Ключ чата -> deque необработанных обновлений; есть в словаре, пока чат обрабатывается
+        self._pending = 0
+        self._lock = threading.Lock()
+
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def submit(self, update):
+        """
+        Ставит обновление в очередь его чата. Возвращает False, если очередь переполнена.
+        """
+        key = get_chat_key(update)
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                return False
+            self._pending += 1
+            chat_queue = self._queues.get(key)
+            if chat_queue is not None:
+                # Чат уже обрабатывается — обновление выполнит тот же обработчик после предыдущих
+                chat_queue.append(update)
+                return True
+            self._queues[key] = deque([update])
+        self._executor.submit(self._drain, key)
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": self._pending,
+                "active_chats": len(self._queues),
+                "processed": self.processed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def _drain(self, key):
+        while True:
+            with self._lock:
+                chat_queue = self._queues[key]
+                if not chat_queue:
+                    del self._queues[key]
+                    return
+                update = chat_queue.popleft()
+
+            try:
+                self.handle(update)
+                failed = False
+            except Exception as e:
+                failed = True
+                print(f"Ошибка обработки обновления {update.get('update_id')}: {e}")
+
+            with self._lock:
+                self._pending -= 1
+                self.processed += 1
+                self.failed += failed
+
+
+class WebhookServer:
+    """
+    HTTP-сервер вебхука: принимает POST на path и отдаёт обновления в UpdateDispatcher.
+    secret — значение заголовка X-Telegram-Bot-Api-Secret-Token (пустое — заголовок не проверяется).
+    """
+
+    def __init__(self, dispatcher, host="127.0.0.1", port=8443, path="/telegram", secret=""):
+        self.dispatcher = dispatcher
+        self.path = path
+        self.secret = secret
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+
+    @property
+    def address(self):
+        host, port = self._httpd.server_address
+        return f"http://{host}:{port}{self.path}"
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="webhook-http", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self.dispatcher.shutdown()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                if self.path != server.path:
+                    return self._reply(404)
+                if server.secret and self.headers.get(SECRET_HEADER) != server.secret:
+                    return self._reply(403)
+                try:
+                    update = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                except ValueError:
+                    return self._reply(400)
+                if not isinstance(update, dict):
+                    return self._reply(400)
+                # Отвечаем сразу: обработка идёт в пуле, Telegram не ждёт обработчиков
+                self._reply(200 if server.dispatcher.submit(update) else 503)
+
+            def _reply(self, status):
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+async def serve_webhook(bot, config):
+    """
+    Запускает интерфейс бота (AsyncTeleBot) в режиме вебхука и работает до отмены задачи.
+    Потоки UpdateDispatcher передают обновления в цикл событий и ждут окончания обработки,
+    поэтому обновления одного чата обрабатываются по порядку.
+    """
+    from telebot import types
+
+    loop = asyncio.get_running_loop()
+
+    def handle(update):
+        asyncio.run_coroutine_threadsafe(bot.process_new_updates([types.Update.de_json(update)]), loop).result()
+
+    dispatcher = UpdateDispatcher(
+        handle,
+        max_concurrency=config.get("webhook_max_concurrency", 16),
+        max_pending=config.get("webhook_max_pending", 1000),
+    )
+    server = WebhookServer(
+        dispatcher,
+        host=config.get("webhook_host", "127.0.0.1"),
+        port=config.get("webhook_port", 8443),
+        path=config.get("webhook_path", "/telegram"),
+        secret=config.get("webhook_secret", ""),
+    )
+
+    # Без webhook_url вебхук не регистрируется (например, за прокси, уже настроенным вручную, или при локальной проверке)
+    if config.get("webhook_url"):
+        await bot.set_webhook(
+            url=config["webhook_url"],
+            secret_token=config.get("webhook_secret") or None,
+            max_connections=config.get("webhook_max_concurrency", 16),
+        )
+    server.start()
+    print(f"Вебхук слушает {server.address}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await loop.run_in_executor(None, server.stop)
+
+
+def replay(path, url, secret=""):
+    """
+    Отправляет записанные обновления (по одному JSON на строку) на вебхук. Возвращает число ошибок.
+    """
+    errors = 0
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            request = Request(url, data=line.strip().encode(), headers={"Content-Type": "application/json"})
+            if secret:
+                request.add_header(SECRET_HEADER, secret)
+            try:
+                with urlopen(request, timeout=10) as response:
+                    status = response.status
+            except OSError as e:
+                status = getattr(e, "code", None) or e
+            if status != 200:
+                errors += 1
+                print(f"{line.strip()[:80]}... → {status}")
+    return errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Отправка записанных обновлений Telegram на локальный вебхук")
+    parser.add_argument("updates", help="файл с обновлениями, по одному JSON на строку")
+    parser.add_argument("--url", default="http://127.0.0.1:8443/telegram")
+    parser.add_argument("--secret", default="", help="значение X-Telegram-Bot-Api-Secret-Token")
+    args = parser.parse_args(argv)
+
+    errors = replay(args.updates, args.url, args.secret)
+    print(f"Ошибок: {errors}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
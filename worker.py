@@ -0,0 +1,163 @@
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from monitoring import get_current_time, prefetch_appstore_versions, prefetch_http_snapshots
+from scheduler import check_subscription
+from settings import get_setting
+from stores.registry import close_driver_pool
+import db
+
+# Как часто свободный воркер заглядывает в очередь заданий
+POLL_SECONDS = 2
+
+# Пауза после ошибки БД в цикле (например, «database is locked»), прежде чем повторить запрос
+ERROR_BACKOFF_SECONDS = 5
+
+# После стольких выдач задание считается «убивающим» воркер (например, Chrome съел всю память):
+# оно снимается с очереди, а подписка откладывается, как после обычной ошибки
+MAX_JOB_ATTEMPTS = 3
+
+
+class MonitoringWorker:
+    """
+    Воркер мониторинга без собственного состояния: берёт задания из общей таблицы jobs в аренду,
+    выполняет проверки на ограниченном пуле потоков и пишет результаты в ту же БД.
+    Пока проверка идёт, аренда продлевается; если воркер упал, его задания после истечения
+    аренды достаются другим воркерам. Воркеров можно запускать сколько угодно (bot.py --worker),
+    каждый берёт не больше заданий, чем у него свободных потоков.
+    """
+
+    def __init__(self, config, name=None, max_workers=None, lease=None):
+        self.config = config
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.max_workers = max_workers or config.get("monitoring_workers", 4)
+        self.lease = lease or get_setting("job_lease_seconds", 300)
+        self.adaptive = get_setting("adaptive_polling", False)
+
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="worker")
+        self._in_flight = set()
+        self._thread = None
+        self._stopped = False
+
+        self.completed = 0
+        self.lost_leases = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="monitoring-worker", daemon=True)
+        self._thread.start()
+        print(f"Воркер {self.name} запущен: потоков {self.max_workers}, аренда {self.lease} с")
+        return self
+
+    def stop(self):
+        """
+        Останавливает воркер, дожидаясь завершения текущих проверок, и закрывает пул Chrome.
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self._executor.shutdown(wait=True)
+        close_driver_pool()
+
+    def join(self):
+        if self._thread:
+            self._thread.join()
+
+    def stats(self):
+        with self._condition:
+            in_flight = len(self._in_flight)
+        queued, leased = db.count_jobs(time.time())
+        return {
+            "worker": self.name,
+            "in_flight": in_flight,
+            "completed": self.completed,
+            "lost_leases": self.lost_leases,
+            "queued": queued,
+            "leased": leased,
+        }
+
+    def _loop(self):
+        """
+        Основной цикл: продлевает аренду выполняемых заданий и добирает новые на свободные потоки.
+        """
+        last_renewal = time.monotonic()
+        while True:
+            with self._condition:
+                if self._stopped:
+                    return
+                in_flight = list(self._in_flight)
+                free = self.max_workers - len(in_flight)
+
+            delay = min(POLL_SECONDS, self.lease / 3)
+            try:
+                if in_flight and time.monotonic() - last_renewal >= self.lease / 3:
+                    db.extend_job_leases(self.name, in_flight, time.time() + self.lease)
+                    last_renewal = time.monotonic()
+
+                jobs = db.claim_jobs(self.name, time.time(), limit=free, lease=self.lease) if free > 0 else []
+                if jobs:
+                    self._start_jobs(jobs)
+                    if len(jobs) == free:
+                        continue  # Возможно, в очереди есть ещё задания, а потоки освободились
+            except Exception as e:
+                # Ошибка БД не должна останавливать воркер; аренда продлится при следующей попытке
+                print(f"Ошибка воркера {self.name}: {e}")
+                delay = min(ERROR_BACKOFF_SECONDS, self.lease / 3)
+
+            with self._condition:
+                if not self._stopped:
+                    self._condition.wait(timeout=delay)
+
+    def _start_jobs(self, jobs):
+        runnable = []
+        for job in jobs:
+            if job.attempts > MAX_JOB_ATTEMPTS:
+                print(f"Задание {job.id} выдавалось {job.attempts - 1} раз без результата и снято с очереди")
+                db.delay_subscription(job.subscription.id, get_current_time(offset_hours=3.25))
+                db.complete_job(job.id, self.name)
+                continue
+            if job.attempts > 1:
+                print(f"Задание {job.id} возвращено в очередь после истечения аренды (попытка {job.attempts})")
+            runnable.append(job)
+
+        # Пакетный запрос App Store и одновременная загрузка HTTP-сторов на все полученные задания
+        try:
+            prefetch_appstore_versions([job.subscription.url for job in runnable if job.subscription.store == "appstore"])
+        except Exception as e:
+            print(f"Ошибка пакетной загрузки App Store: {e}")
+        try:
+            prefetch_http_snapshots([job.subscription for job in runnable])
+        except Exception as e:
+            print(f"Ошибка асинхронной загрузки сторов: {e}")
+
+        for job in runnable:
+            with self._condition:
+                self._in_flight.add(job.id)
+            try:
+                self._executor.submit(self._run, job)
+            except RuntimeError:
+                # Воркер останавливается — задание вернётся в очередь после истечения аренды
+                with self._condition:
+                    self._in_flight.discard(job.id)
+
+    def _run(self, job):
+        try:
+            check_subscription(job.subscription, self.config, self.adaptive)
+        finally:
+            try:
+                completed = db.complete_job(job.id, self.name)
+            except Exception as e:
+                # Задание вернётся в очередь после истечения аренды, а поток освобождается в любом случае
+                print(f"Ошибка завершения задания {job.id}: {e}")
+                completed = False
+            with self._condition:
+                self._in_flight.discard(job.id)
+                if completed:
+                    self.completed += 1
+                else:
+                    self.lost_leases += 1
+                self._condition.notify_all()
+            if not completed:
+                print(f"Аренда задания {job.id} истекла до завершения проверки, задание выполнит другой воркер")